@@ -0,0 +1,257 @@
+"""
+Powell CM Solutions - Amendments
+--------------------------------
+Update a previously generated agreement after its data changed, keeping manual
+edits everywhere else.
+
+The agreement is rendered twice from the clause library: with the old data
+(what the file looked like when it was generated) and with the new data.
+Diffing those two renders paragraph by paragraph (tables count as one element)
+gives exactly the elements that change: a new `nte` touches the paragraphs
+that show it, new `rates` the rate tables, a different clause variant the
+paragraphs of that variant. The existing file is aligned with the old render
+the same way, and only the elements that changed are swapped for their new
+versions; every other element of the file is kept as is, including paragraphs
+edited or added by hand.
+
+If an element that has to change was itself edited by hand (or deleted), the
+amendment would lose that edit, so amend() raises AmendmentConflict listing
+those elements; with force=True it replaces them anyway and lists them in the
+redline summary.
+
+Usage:
+    result = amend("Agreement.docx", old_data, new_data, "Agreement_Amended.docx")
+    print(result.redline)
+
+    python amendments.py Agreement.docx old.json new.json [-o Amended.docx] [--redline changes.txt] [--force]
+"""
+
+import argparse
+import difflib
+import json
+import sys
+
+from docx import Document
+from docx.oxml.ns import qn
+
+import contract_generator
+import docx_package
+
+class AmendmentConflict(ValueError):
+    """Elements the amendment must replace were edited by hand; `conflicts` lists them."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts  # [(section heading, text in the file or None if deleted, expected text)]
+        lines = [f"  [{heading or 'Preamble'}] {expected[:70]!r}" for heading, _, expected in conflicts]
+        super().__init__(f"{len(conflicts)} element(s) to be replaced were edited by hand "
+                         f"(use force to overwrite):\n" + "\n".join(lines))
+
+class AmendmentResult:
+    def __init__(self, output_path, changed, rewritten, added, removed, overwritten, redline):
+        self.output_path = output_path
+        self.changed = changed  # data key -> (old value, new value)
+        self.rewritten = rewritten  # section headings with replaced elements
+        self.added = added
+        self.removed = removed
+        self.overwritten = overwritten  # conflicts replaced because of force=True
+        self.redline = redline
+
+# ---------------------------- Elements ----------------------------
+
+def is_section_heading(element):
+    if element.tag != qn('w:p'):
+        return False
+    style = element.find(f"{qn('w:pPr')}/{qn('w:pStyle')}")
+    return style is not None and style.get(qn('w:val')) == "Heading1"
+
+def element_text(element):
+    if element.tag == qn('w:tbl'):
+        return "\n".join(" | ".join("".join(t.text or "" for t in tc.iter(qn('w:t'))) for tc in tr.iter(qn('w:tc')))
+                         for tr in element.iter(qn('w:tr')))
+    return "".join(t.text or "" for t in element.iter(qn('w:t')))
+
+def body_elements(body):
+    """Block elements of a document body, without the trailing sectPr."""
+    return [element for element in body if element.tag != qn('w:sectPr')]
+
+def section_headings(elements):
+    """The level-1 heading each element falls under ("" before the first one)."""
+    heading, out = "", []
+    for element in elements:
+        if is_section_heading(element):
+            heading = element_text(element)
+        out.append(heading)
+    return out
+
+def align(existing_texts, expected_texts):
+    """expected index -> (existing index, pristine) for the expected elements still in the file.
+
+    Matching text is pristine; a run of edited elements the same length as the run
+    it replaced is paired up as edited. Anything else counts as deleted (expected)
+    or added by hand (existing).
+    """
+    matched = {}
+    matcher = difflib.SequenceMatcher(None, existing_texts, expected_texts, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal" or (op == "replace" and i2 - i1 == j2 - j1):
+            for offset in range(j2 - j1):
+                matched[j1 + offset] = (i1 + offset, op == "equal")
+    return matched
+
+# ---------------------------- Amend ----------------------------
+
+def changed_keys(old_data, new_data):
+    return {key: (old_data.get(key), new_data.get(key))
+            for key in contract_generator.DEFAULTS if old_data.get(key) != new_data.get(key)}
+
+def amend(docx_path, old_data, new_data, output_path=None, force=False):
+    """Replace the elements of `docx_path` that change from `old_data` to `new_data`; returns an AmendmentResult.
+
+    `docx_path` may be a path or a readable binary stream; `output_path` defaults to
+    overwriting `docx_path`. Raises AmendmentConflict if an element to be replaced was
+    edited by hand, unless `force` is set.
+    """
+    old_data = contract_generator.normalize_data(old_data)
+    new_data = contract_generator.normalize_data(new_data)
+    changed = changed_keys(old_data, new_data)
+
+    doc = Document(docx_path)
+    body = doc.element.body
+    existing = body_elements(body)
+    # Both rendered from the cached skeletons.
+    old = body_elements(contract_generator.render_document(old_data).element.body)
+    fresh_doc = contract_generator.render_document(new_data)
+    new = body_elements(fresh_doc.element.body)
+    old_texts, new_texts = [element_text(e) for e in old], [element_text(e) for e in new]
+    old_headings, new_headings = section_headings(old), section_headings(new)
+    matched = align([element_text(e) for e in existing], old_texts)
+
+    removed_at, before, after, tail = set(), {}, {}, []
+    conflicts, diffs = [], []
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_texts, new_texts, autojunk=False).get_opcodes():
+        if op == "equal":
+            continue
+        for j in range(i1, i2):
+            index, pristine = matched.get(j, (None, False))
+            if not pristine:
+                text = element_text(existing[index]) if index is not None else None
+                conflicts.append((old_headings[j], text, old_texts[j]))
+            if index is not None:
+                removed_at.add(index)
+        # New elements go where the replaced ones were, else next to the nearest surviving neighbour.
+        kept = [matched[j][0] for j in range(i1, i2) if j in matched]
+        earlier = [matched[j][0] for j in range(i1) if j in matched]
+        later = [matched[j][0] for j in range(i2, len(old)) if j in matched]
+        if kept:
+            before.setdefault(kept[0], []).extend(new[j1:j2])
+        elif earlier:
+            after.setdefault(earlier[-1], []).extend(new[j1:j2])
+        elif later:
+            before.setdefault(later[0], []).extend(new[j1:j2])
+        else:
+            tail.extend(new[j1:j2])
+        heading = new_headings[j1] if j1 < j2 else old_headings[i1]
+        diffs.append((heading, old_texts[i1:i2], new_texts[j1:j2]))
+    if conflicts and not force:
+        raise AmendmentConflict(conflicts)
+
+    order = []
+    for index, element in enumerate(existing):
+        order.extend(before.get(index, ()))
+        if index not in removed_at:
+            order.append(element)
+        order.extend(after.get(index, ()))
+    order.extend(tail)
+
+    # Files generated before the body styles existed lack them.
+    docx_package.copy_missing_styles(doc, fresh_doc)
+    sect_pr = body.find(qn('w:sectPr'))
+    for element in existing:
+        body.remove(element)
+    for element in order:
+        if sect_pr is not None:
+            sect_pr.addprevious(element)
+        else:
+            body.append(element)
+
+    if output_path is None:
+        output_path = docx_path
+    doc.save(output_path)
+    if contract_generator.ARCHIVE_PATH and not hasattr(output_path, 'write'):
+        import archive
+        archive.record(new_data, output_path)
+
+    old_sections, new_sections = set(old_headings), set(new_headings)
+    touched = list(dict.fromkeys(heading for heading, _, _ in diffs))
+    rewritten = [h for h in touched if h in old_sections and h in new_sections]
+    added = [h for h in dict.fromkeys(new_headings) if h not in old_sections]
+    removed = [h for h in dict.fromkeys(old_headings) if h not in new_sections]
+    return AmendmentResult(output_path, changed, rewritten, added, removed, conflicts,
+                           redline(changed, diffs, conflicts))
+
+# ---------------------------- Redline ----------------------------
+
+def describe_change(key, old, new):
+    if isinstance(old, dict) and isinstance(new, dict):
+        parts = [f"+{name} {new[name]!r}" for name in new if name not in old]
+        parts += [f"-{name}" for name in old if name not in new]
+        parts += [f"{name} {old[name]!r} -> {new[name]!r}" for name in new if name in old and old[name] != new[name]]
+        return f"  {key}: " + "; ".join(parts)
+    return f"  {key}: {old!r} -> {new!r}"
+
+def text_lines(texts):
+    return [line for text in texts for line in text.split("\n")]
+
+def redline(changed, diffs, overwritten=()):
+    """Plain-text summary: changed fields, a line diff of each replaced run of elements, overwritten hand edits."""
+    lines = ["Amendment summary", "", "Changed fields:"]
+    lines.extend(describe_change(key, old, new) for key, (old, new) in changed.items())
+    if not changed:
+        lines.append("  (none)")
+    for heading, old_texts, new_texts in diffs:
+        lines.append("")
+        lines.append(f"[{heading or 'Preamble'}]" + ("" if old_texts else " (added)")
+                     + ("" if new_texts else " (removed)"))
+        for line in difflib.ndiff(text_lines(old_texts), text_lines(new_texts)):
+            if line[:1] in "-+":
+                lines.append(f"  {line}")
+    if overwritten:
+        lines += ["", "Hand edits overwritten:"]
+        for heading, text, expected in overwritten:
+            state = "deleted by hand" if text is None else f"was {text!r}"
+            lines.append(f"  [{heading or 'Preamble'}] {expected!r} ({state})")
+    return "\n".join(lines) + "\n"
+
+# ---------------------------- Main ----------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update only the parts of an agreement affected by a data change.")
+    parser.add_argument("docx", help="previously generated agreement")
+    parser.add_argument("old", help="JSON file with the data the agreement was generated from")
+    parser.add_argument("new", help="JSON file with the amended data")
+    parser.add_argument("-o", "--out", help="output .docx (default: overwrite the input)")
+    parser.add_argument("--redline", metavar="FILE", help="write the change summary here instead of stdout")
+    parser.add_argument("--force", action="store_true",
+                        help="replace elements even where they were edited by hand (listed in the summary)")
+    args = parser.parse_args(argv)
+
+    with open(args.old, encoding='utf-8') as fh:
+        old_data = json.load(fh)
+    with open(args.new, encoding='utf-8') as fh:
+        new_data = json.load(fh)
+    try:
+        result = amend(args.docx, old_data, new_data, args.out, force=args.force)
+    except AmendmentConflict as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.redline:
+        with open(args.redline, 'w', encoding='utf-8') as fh:
+            fh.write(result.redline)
+    else:
+        sys.stdout.write(result.redline)
+    print(f"Updated {len(result.rewritten)} section(s), added {len(result.added)}, removed {len(result.removed)} "
+          f"-> {result.output_path}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,230 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, Response, abort, g, jsonify, render_template, request, send_file, url_for
 import contract_generator
-import tempfile
+import io
 import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import archive
+import export
+import metrics
+from jobs import JobEngine, QueueFull
+from render_cache import RenderCache
 
 app = Flask(__name__)
 
+KEY_RE = re.compile(r"[0-9a-f]{64}")
+DOCX_MIMETYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+render_cache = RenderCache(
+    max_bytes=int(os.environ.get("RENDER_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    disk_dir=os.environ.get("RENDER_CACHE_DIR") or None,
+    disk_max_bytes=int(os.environ.get("RENDER_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024)),
+    backend=os.environ.get("RENDER_BACKEND", "docx"),
+)
+
+# Every generation, synchronous form posts included, runs on this bounded pool.
+engine = JobEngine(
+    workers=int(os.environ.get("JOB_WORKERS", 4)),
+    queue_depth=int(os.environ.get("JOB_QUEUE_DEPTH", 64)),
+    result_ttl=float(os.environ.get("JOB_RESULT_TTL", 600)),
+    max_results=int(os.environ.get("JOB_MAX_RESULTS", 1000)),
+)
+FORM_TIMEOUT = float(os.environ.get("JOB_FORM_TIMEOUT", 60))
+
+# Exports render in the streaming response rather than on the job pool; this caps how many run at once.
+export_slots = threading.BoundedSemaphore(int(os.environ.get("EXPORT_CONCURRENCY", 2)))
+
+# form.html field name -> build_agreement() key (fields not listed already match)
+FORM_FIELDS = {
+    "client_legal_name": "client_name",
+    "firm_legal_name": "firm_name",
+    "compensation_method": "compensation",
+    "hourly_cap": "nte",
+    "insurance_tier": "insurance",
+    "dispute_resolution": "dispute",
+    "payment_terms_days": "net_days",
+    "liability_multiplier": "lol_multiplier",
+    "annual_rate_increase_cap": "annual_increase_cap",
+    "deliverables_ownership": "ip_assignment",
+    "include_inclusion": "include_dei",
+    "include_additional_insured": "ai_required",
+}
+
+def warm_up():
+    contract_generator.warm_up(render_cache.backend)
+
+# Load python-docx, the template and the default skeleton before the first request;
+# workers forked from a preloaded app (gunicorn --preload) inherit them.
+if os.environ.get("APP_WARM_UP", "1") != "0":
+    warm_up()
+
+def form_to_data(form):
+    return contract_generator.normalize_data({FORM_FIELDS.get(k, k): v for k, v in form.items()})
+
+def docx_response(key, blob):
+    # The cache key is the ETag; the same document can be fetched again (and
+    # revalidated with If-None-Match) from the GET route in Content-Location.
+    resp = send_file(io.BytesIO(blob), mimetype=DOCX_MIMETYPE, as_attachment=True,
+                     download_name="Generated_Agreement.docx", etag=key, conditional=False)
+    resp.headers['Content-Location'] = url_for('download', key=key)
+    return resp
+
+@app.before_request
+def start_trace():
+    if metrics.ENABLED:
+        g.trace = []
+        g.trace_token = metrics.current_trace.set(g.trace)
+        g.trace_start = time.perf_counter()
+
+@app.teardown_request
+def finish_trace(exc):
+    if 'trace_start' in g:
+        metrics.current_trace.reset(g.trace_token)
+        status = g.get('status', 500)
+        metrics.record_request(request.endpoint or "unknown", request.method, status,
+                               time.perf_counter() - g.trace_start, g.trace)
+
+@app.after_request
+def remember_status(resp):
+    g.status = resp.status_code
+    return resp
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.ENABLED:
+        abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.errorhandler(QueueFull)
+def queue_full(e):
+    resp = jsonify(error=str(e))
+    resp.status_code = 429
+    resp.headers['Retry-After'] = "1"
+    return resp
+
+@app.errorhandler(contract_generator.DataError)
+def bad_data(e):
+    resp = jsonify(error=str(e))
+    resp.status_code = 400
+    return resp
+
 @app.route('/', methods=['GET', 'POST'])
 def home():
     if request.method == 'POST':
-        data = request.form.to_dict()
+        data = form_to_data(request.form.to_dict())
+        try:
+            key, blob = engine.run(render_cache.get_or_render, data, timeout=FORM_TIMEOUT)
+        except TimeoutError:
+            abort(503)
+        return docx_response(key, blob)
 
-        temp_path = tempfile.mktemp(suffix=".docx")
-        contract_generator.build_agreement(data, output_path=temp_path)
+    return render_template('form.html')
 
-        return send_file(temp_path, as_attachment=True, download_name="Generated_Agreement.docx")
+@app.route('/agreements/<key>.docx')
+def download(key):
+    """Re-download a rendered agreement by its ETag while it is still cached."""
+    if not KEY_RE.fullmatch(key):
+        abort(404)
+    if request.if_none_match.contains(key):
+        resp = Response(status=304)
+        resp.set_etag(key)
+        return resp
+    blob = render_cache.get(key)
+    if blob is None:
+        abort(404)
+    return docx_response(key, blob)
 
-    return render_template('form.html')
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a generation from form fields or a JSON object; returns 202 with the job id."""
+    fields = request.get_json(silent=True) if request.is_json else request.form.to_dict()
+    if not isinstance(fields, dict):
+        abort(400)
+    job = engine.submit(render_cache.get_or_render, form_to_data(fields))
+    resp = jsonify(job_json(job))
+    resp.status_code = 202
+    resp.headers['Location'] = url_for('job_status', job_id=job.id)
+    return resp
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = engine.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job_json(job))
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    job = engine.get(job_id)
+    if job is None:
+        abort(404)
+    if job.status != "done":
+        resp = jsonify(job_json(job))
+        resp.status_code = 409
+        return resp
+    key, blob = job.result
+    return docx_response(key, blob)
+
+@app.route('/exports', methods=['POST'])
+def create_export():
+    """Stream a ZIP with one agreement per record of {"records": [...], "where": {...}}.
+
+    Without "records", the agreements recorded in the archive index that match "where" are exported.
+    """
+    body = request.get_json(silent=True)
+    if isinstance(body, list):
+        body = {"records": body}
+    if not isinstance(body, dict) or not isinstance(body.get("records", []), list) \
+            or not isinstance(body.get("where", {}), dict):
+        abort(400)
+    where = export.normalize_where(body.get("where", {}), FORM_FIELDS)  # DataError -> 400
+    if "records" in body:
+        records = [{FORM_FIELDS.get(k, k): v for k, v in r.items()} if isinstance(r, dict)
+                   else ValueError("not an object") for r in body["records"]]
+    elif where and contract_generator.ARCHIVE_PATH:
+        records = archive.select_data(where)
+    else:
+        abort(400)
+    if not export_slots.acquire(blocking=False):
+        raise QueueFull("too many exports running")
+    resp = Response(export.stream_agreements(records, where, render_cache.backend),
+                    mimetype="application/zip")
+    resp.call_on_close(export_slots.release)
+    resp.headers['Content-Disposition'] = f'attachment; filename="agreements_{contract_generator.timestamp_suffix()}.zip"'
+    return resp
+
+@app.route('/archive')
+def archive_search():
+    """Search the archive index; query parameters are archive.search() arguments."""
+    if not contract_generator.ARCHIVE_PATH:
+        abort(404)
+    args = request.args
+    try:
+        amounts = {name: float(args[name]) for name in ("min_amount", "max_amount") if args.get(name)}
+        rows = archive.search(client=args.get("client"), project=args.get("project"), role=args.get("role"),
+                              compensation=args.get("compensation"), dispute=args.get("dispute"),
+                              insurance=args.get("insurance"), venue=args.get("venue"), text=args.get("text"),
+                              limit=min(int(args.get("limit", 100)), 1000), **amounts)
+    except ValueError:
+        abort(400)
+    except sqlite3.OperationalError as e:  # malformed full-text query
+        resp = jsonify(error=str(e))
+        resp.status_code = 400
+        return resp
+    return jsonify(agreements=rows)
+
+def job_json(job):
+    out = job.to_dict()
+    out["status_url"] = url_for('job_status', job_id=job.id)
+    out["download_url"] = url_for('job_download', job_id=job.id)
+    return out
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5050)
+    if "--profile-startup" in sys.argv[1:]:
+        import startup
+        print(startup.format_report(*startup.profile(startup.app_phases())))
+    else:
+        app.run(host='0.0.0.0', port=5050)
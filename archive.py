@@ -0,0 +1,459 @@
+"""
+Powell CM Solutions - Agreement Archive
+---------------------------------------
+SQLite index of generated agreements.
+
+build_agreement records every agreement it writes to a file (see
+contract_generator.ARCHIVE_PATH): the normalized data dict, the file location
+and the agreement text. The fields people search by (client, project, role,
+compensation, dispute, insurance, venue, amount) are indexed NOCASE columns
+and the text goes into an FTS5 table, so searches over tens of thousands of
+agreements are index lookups.
+
+backfill() indexes .docx files generated before the archive existed. It reads
+word/document.xml and matches each paragraph against the clause library text,
+which recovers the field values (from the {{field}} slots) and the clause
+options (from which variant's text is present).
+
+Usage:
+    archive.search(client="Acme", dispute="Arbitration", venue="Illinois", min_amount=500000)
+
+    python archive.py search --client Acme --dispute Arbitration --venue Illinois --min-amount 500000
+    python archive.py search --text "additional insured" --json
+    python archive.py backfill . agreements/
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+from functools import lru_cache
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+
+import clauses
+import contract_generator
+import rate_schedule
+
+log = logging.getLogger(__name__)
+
+# Searchable text columns; each has a NOCASE index.
+COLUMNS = ("client_name", "project_name", "role", "compensation", "dispute", "insurance",
+           "venue_county", "venue_state", "venue_city")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS agreements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL,
+    mtime REAL,
+    source TEXT NOT NULL,
+    backend TEXT,
+    {", ".join(f"{column} TEXT COLLATE NOCASE" for column in COLUMNS)},
+    amount REAL
+);
+-- Kept apart so the rows searches scan and sort stay small.
+CREATE TABLE IF NOT EXISTS agreement_data (
+    id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+{"".join(f"CREATE INDEX IF NOT EXISTS agreements_{column} ON agreements ({column});" for column in COLUMNS)}
+CREATE INDEX IF NOT EXISTS agreements_amount ON agreements (amount);
+CREATE INDEX IF NOT EXISTS agreements_created ON agreements (created);
+CREATE VIRTUAL TABLE IF NOT EXISTS agreements_text USING fts5(body, content='');
+"""
+
+# ---------------------------- Connections ----------------------------
+
+_local = threading.local()
+
+def open_archive(path=None, check_same_thread=True):
+    path = os.path.abspath(path or contract_generator.ARCHIVE_PATH)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def connect(path=None):
+    """This thread's connection to the archive at `path` (default contract_generator.ARCHIVE_PATH)."""
+    # Keyed by pid too: batch workers fork with the parent's thread-local state.
+    key = (os.getpid(), os.path.abspath(path or contract_generator.ARCHIVE_PATH))
+    connections = _local.__dict__.setdefault("connections", {})
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = open_archive(key[1])
+    return conn
+
+# ---------------------------- Recording ----------------------------
+
+def amount(data):
+    """The contract amount: NTE, lump sum or monthly cap, whichever the compensation method uses."""
+    return {"Hourly": data['nte'], "Lump Sum": data['lump_sum']}.get(data['compensation'], data['monthly_cap'])
+
+def agreement_text(data):
+    """Plain text of the agreement `data` renders to, from the clause plan (no document needed)."""
+    fields = contract_generator.render_fields(data)
+    sub = lambda m: fields.get(m.group(1), m.group(0))
+    opts = dict(zip(clauses.OPTIONS + clauses.TOGGLES, contract_generator.option_key(data)))
+    lines = []
+    for step in clauses.current().plan(opts):
+        if step[0] in ("p", "heading", "title"):
+            lines.append(contract_generator.PLACEHOLDER_RE.sub(sub, step[1]))
+        elif step[0] == "rate_table":
+            lines.extend(" ".join(row) for row in rate_schedule.rate_rows(data['rates'], contract_generator.clean_text))
+    return "\n".join(lines)
+
+def put(conn, data, location, created, mtime, source, backend, text):
+    """Insert or replace the entry for `location` (call inside a transaction)."""
+    # The text index is contentless (it would otherwise store ~15 KB of text per
+    # agreement), so a replaced entry's terms stay behind under its old id. Ids are
+    # never reused (AUTOINCREMENT) and searches join on agreements, so they never match.
+    old = conn.execute("SELECT id FROM agreements WHERE location = ?", (location,)).fetchone()
+    if old is not None:
+        conn.execute("DELETE FROM agreements WHERE id = ?", (old[0],))
+        conn.execute("DELETE FROM agreement_data WHERE id = ?", (old[0],))
+    cur = conn.execute(
+        f"INSERT INTO agreements (location, created, mtime, source, backend, {', '.join(COLUMNS)}, amount) "
+        f"VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(COLUMNS))}, ?)",
+        (location, created, mtime, source, backend, *(data[column] for column in COLUMNS), amount(data)))
+    conn.execute("INSERT INTO agreement_data (id, data) VALUES (?, ?)",
+                 (cur.lastrowid, json.dumps(data, ensure_ascii=False, default=str)))
+    conn.execute("INSERT INTO agreements_text (rowid, body) VALUES (?, ?)", (cur.lastrowid, text))
+
+def record(data, location, backend="docx"):
+    """Index a freshly written agreement; errors are logged, never raised into the build."""
+    record_many([(data, location, backend)])
+
+def record_many(entries):
+    """Index (data, location, backend) entries in one transaction, e.g. a whole batch run.
+
+    The data is stored normalized. An entry that cannot be indexed is logged and
+    skipped; nothing is raised into the build that wrote the files.
+    """
+    now = time.time()
+    try:
+        conn = connect()
+        conn.execute("BEGIN")
+    except Exception as e:
+        log.warning("%d agreement(s) not archived: %s", len(entries), e)
+        return
+    try:
+        for data, location, backend in entries:
+            conn.execute("SAVEPOINT entry")
+            try:
+                data = contract_generator.normalize_data(data)
+                location = os.path.abspath(os.fspath(location))
+                put(conn, data, location, now, os.path.getmtime(location), "build", backend, agreement_text(data))
+            except Exception as e:
+                conn.execute("ROLLBACK TO entry")
+                log.warning("agreement not archived (%s): %s", location, e)
+            conn.execute("RELEASE entry")
+        conn.execute("COMMIT")
+    except Exception as e:
+        conn.rollback()
+        log.warning("%d agreement(s) not archived: %s", len(entries), e)
+
+# ---------------------------- Search ----------------------------
+
+def search(client=None, project=None, role=None, compensation=None, dispute=None, insurance=None, venue=None,
+           min_amount=None, max_amount=None, text=None, limit=100, path=None):
+    """Archived agreements matching every given filter, newest first, as dicts.
+
+    `client`, `project` and `role` match case-insensitive prefixes; `compensation`,
+    `dispute` and `insurance` whole values; `venue` the state, county or city.
+    `text` is an FTS5 query over the agreement text, e.g. '"additional insured"'.
+    """
+    where, args = [], []
+    for column, value in (("client_name", client), ("project_name", project), ("role", role)):
+        if value:
+            where.append(f"{column} >= ? AND {column} < ?")  # a prefix range on the NOCASE index
+            args += [value, value + "\U0010ffff"]
+    for column, value in (("compensation", compensation), ("dispute", dispute), ("insurance", insurance)):
+        if value:
+            where.append(f"{column} = ?")
+            args.append(value)
+    if venue:
+        where.append("(venue_state = ? OR venue_county = ? OR venue_city = ?)")
+        args += [venue] * 3
+    if min_amount is not None:
+        where.append("amount >= ?")
+        args.append(float(min_amount))
+    if max_amount is not None:
+        where.append("amount <= ?")
+        args.append(float(max_amount))
+    if text:
+        where.append("id IN (SELECT rowid FROM agreements_text WHERE agreements_text MATCH ?)")
+        args.append(text)
+    sql = "SELECT * FROM agreements" + (" WHERE " + " AND ".join(where) if where else "")
+    conn = connect(path)
+    rows = [dict(row) for row in conn.execute(sql + " ORDER BY created DESC LIMIT ?", args + [int(limit)])]
+    if rows:
+        ids = [row["id"] for row in rows]
+        data = dict(conn.execute(f"SELECT id, data FROM agreement_data WHERE id IN ({', '.join('?' * len(ids))})",
+                                 ids).fetchall())
+        for row in rows:
+            row["data"] = json.loads(data[row["id"]])
+    return rows
+
+def select_data(where=None, path=None):
+    """Yield the data dict of every archived agreement whose text columns contain the `where` values.
+
+    Other `where` keys are not filtered here (see export.matches). Uses its own
+    connection, so the generator may be consumed on another thread.
+    """
+    clauses_sql, args = [], []
+    for key, value in (where or {}).items():
+        if key in COLUMNS:
+            clauses_sql.append(f"instr(lower({key}), lower(?)) > 0")
+            args.append(str(value).strip())
+    sql = "SELECT data FROM agreements JOIN agreement_data USING (id)"
+    sql += (" WHERE " + " AND ".join(clauses_sql) if clauses_sql else "") + " ORDER BY created"
+    conn = open_archive(path, check_same_thread=False)
+    try:
+        for row in conn.execute(sql, args):
+            yield json.loads(row[0])
+    finally:
+        conn.close()
+
+# ---------------------------- Backfill ----------------------------
+
+PREFIX = 8
+
+class TextMatcher:
+    """Recovers field values and clause options from the paragraphs of a generated agreement."""
+
+    def __init__(self, library):
+        self.library = library
+        self.exact = {}  # paragraph text -> [conditions], for text without slots
+        self.templates = {}  # text with slots -> [conditions]
+        self.toggles = set()
+        self._walk(library.root, ())
+        self.patterns, self.short = {}, []
+        for template, conditions in self.templates.items():
+            entry = (self._compile(template), conditions)
+            prefix = contract_generator.PLACEHOLDER_RE.split(template)[0]
+            if len(prefix) >= PREFIX:
+                self.patterns.setdefault(prefix[:PREFIX], []).append(entry)
+            else:
+                self.short.append(entry)
+
+    def _walk(self, compiled, conditions):
+        for item in compiled:
+            kind = item[0]
+            if kind == "choose":
+                _, option, cases, default = item
+                for value, sub in cases.items():
+                    self._walk(sub, conditions + ((option, value),))
+                self._walk(default, conditions + ((option, None),))
+            elif kind == "if":
+                _, toggle, then, otherwise = item
+                if isinstance(contract_generator.DEFAULTS.get(toggle), bool):
+                    self.toggles.add(toggle)
+                self._walk(then, conditions + ((toggle, True),))
+                self._walk(otherwise, conditions + ((toggle, False),))
+            elif kind in ("p", "heading", "title"):
+                template = item[1]
+                if not contract_generator.PLACEHOLDER_RE.sub("", template).strip():
+                    continue  # a bare {{field}} paragraph would match anything
+                target = self.templates if "{{" in template else self.exact
+                target.setdefault(template, []).append(conditions)
+
+    @staticmethod
+    def _compile(template):
+        parts = contract_generator.PLACEHOLDER_RE.split(template)
+        regex, seen = [], set()
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                regex.append(re.escape(part))
+            elif part in seen:
+                regex.append(f"(?P={part})")
+            else:
+                seen.add(part)
+                regex.append(f"(?P<{part}>.*?)")
+        return re.compile("".join(regex) + r"\Z", re.S)
+
+    def match(self, text):
+        """(fields, [conditions]) for a paragraph, or None if no library text matches it."""
+        conditions = self.exact.get(text)
+        if conditions is not None:
+            return {}, conditions
+        for pattern, conditions in self.patterns.get(text[:PREFIX], []) + self.short:
+            m = pattern.match(text)
+            if m:
+                return m.groupdict(), conditions
+        return None
+
+    def recover(self, paragraphs, tables):
+        """A build_agreement() data dict for a document's paragraph texts and table cell texts."""
+        record, options = {}, {}
+        for text in paragraphs:
+            found = self.match(text)
+            if found is None:
+                continue
+            fields, conditions = found
+            for name, value in fields.items():
+                record.setdefault(name, value)
+            if len(conditions) == 1:  # text shared by several variants says nothing about the options
+                for name, value in conditions[0]:
+                    options.setdefault(name, value)
+        for toggle in self.toggles:
+            options.setdefault(toggle, False)
+        for name, value in options.items():
+            if value is None:  # the default variant: the one menu choice without its own text, if any
+                others = [c for c in contract_generator.CHOICES.get(name, ()) if c not in self.library.cases(name)]
+                value = others[0] if len(others) == 1 else None
+            if value is not None and name in contract_generator.DEFAULTS:
+                record.setdefault(name, value)
+        if "lol_text" in record:
+            m = re.match(r"(\d+)x", record.pop("lol_text"))
+            record["lol_multiplier"] = int(m.group(1)) if m else 0
+        if tables:
+            record["rates"] = {row[0]: row[1] for row in tables[0][1:] if len(row) >= 2}
+        for table in tables[1:]:
+            if table and table[0][:2] == ["Role", "Year 1"]:
+                record["projection_years"] = len(table[0]) - 1
+        return record
+
+@lru_cache(maxsize=1)
+def text_matcher(library):
+    return TextMatcher(library)
+
+def element_text(element):
+    return "".join(t.text or "" for t in element.iter(qn('w:t')))
+
+def read_body(source):
+    """(paragraph texts, tables as lists of cell-text rows) of a .docx."""
+    with zipfile.ZipFile(source) as zf:
+        root = parse_xml(zf.read("word/document.xml"))
+    paragraphs, tables = [], []
+    for element in root.find(qn('w:body')):
+        if element.tag == qn('w:p'):
+            paragraphs.append(element_text(element))
+        elif element.tag == qn('w:tbl'):
+            tables.append([[element_text(tc) for tc in tr.iter(qn('w:tc'))] for tr in element.iter(qn('w:tr'))])
+    return paragraphs, tables
+
+def docx_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith(".docx") and not name.startswith("~$"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def backfill(paths, archive_path=None, force=False, commit_every=500):
+    """Index the .docx files under `paths` (files or directories).
+
+    Files already indexed with the same mtime are skipped unless `force`.
+    Returns (indexed, skipped, [(path, reason)] for files that were not indexed).
+    """
+    conn = connect(archive_path)
+    known = dict(conn.execute("SELECT location, mtime FROM agreements").fetchall())
+    matcher = text_matcher(clauses.current())
+    indexed = skipped = 0
+    failed = []
+    conn.execute("BEGIN")
+    try:
+        for path in docx_files(paths):
+            location = os.path.abspath(path)
+            try:
+                mtime = os.path.getmtime(location)
+                if not force and known.get(location) == mtime:
+                    skipped += 1
+                    continue
+                paragraphs, tables = read_body(location)
+            except (OSError, KeyError, zipfile.BadZipFile, ValueError) as e:
+                failed.append((path, f"{type(e).__name__}: {e}"))
+                continue
+            record = matcher.recover(paragraphs, tables)
+            if "client_name" not in record:
+                failed.append((path, "not a generated agreement"))
+                continue
+            try:
+                data = contract_generator.normalize_data(record)
+            except contract_generator.DataError as e:
+                failed.append((path, f"DataError: {e}"))
+                continue
+            text = "\n".join(paragraphs + [" ".join(row) for table in tables for row in table])
+            put(conn, data, location, mtime, mtime, "backfill", None, text)
+            indexed += 1
+            if indexed % commit_every == 0:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("PRAGMA optimize")  # refresh planner statistics after a bulk load
+    return indexed, skipped, failed
+
+# ---------------------------- Main ----------------------------
+
+def print_table(rows):
+    print(f"{'id':>6}  {'created':<16}  {'client':<24}  {'project':<24}  {'compensation':<12}  {'amount':>14}  location")
+    for row in rows:
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(row['created']))
+        print(f"{row['id']:>6}  {created:<16}  {row['client_name'][:24]:<24}  {row['project_name'][:24]:<24}  "
+              f"{row['compensation'][:12]:<12}  {rate_schedule.money(row['amount']):>14}  {row['location']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search and backfill the index of generated agreements.")
+    parser.add_argument("--archive", default=None, help="index file (default: $AGREEMENT_ARCHIVE or agreements.sqlite3)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    find = commands.add_parser("search", help="list archived agreements matching all given filters")
+    find.add_argument("--client", help="client name prefix")
+    find.add_argument("--project", help="project name prefix")
+    find.add_argument("--role", help="role prefix")
+    find.add_argument("--compensation", choices=contract_generator.CHOICES["compensation"])
+    find.add_argument("--dispute", choices=contract_generator.CHOICES["dispute"])
+    find.add_argument("--insurance", choices=contract_generator.CHOICES["insurance"])
+    find.add_argument("--venue", help="venue state, county or city")
+    find.add_argument("--min-amount", type=float)
+    find.add_argument("--max-amount", type=float)
+    find.add_argument("--text", help="full-text query (SQLite FTS5 syntax)")
+    find.add_argument("--limit", type=int, default=100)
+    find.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    fill = commands.add_parser("backfill", help="index existing .docx files")
+    fill.add_argument("paths", nargs="+", help=".docx files or directories to scan recursively")
+    fill.add_argument("--force", action="store_true", help="re-index files that are already indexed")
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        start = time.perf_counter()
+        indexed, skipped, failed = backfill(args.paths, args.archive, args.force)
+        print(f"Indexed {indexed} agreements in {time.perf_counter() - start:.2f}s "
+              f"({skipped} unchanged, {len(failed)} not indexed)")
+        for path, reason in failed:
+            print(f"  {path}: {reason}")
+        return 0
+
+    start = time.perf_counter()
+    try:
+        rows = search(args.client, args.project, args.role, args.compensation, args.dispute, args.insurance,
+                      args.venue, args.min_amount, args.max_amount, args.text, args.limit, args.archive)
+    except sqlite3.OperationalError as e:
+        print(f"search failed: {e}", file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows)
+        print(f"{len(rows)} agreement{'s' if len(rows) != 1 else ''} in {1000 * elapsed:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
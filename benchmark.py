@@ -0,0 +1,100 @@
+"""
+Powell CM Solutions - Backend Benchmark
+---------------------------------------
+Times build_agreement for each rendering backend across the full option matrix
+(every role x compensation x insurance x dispute x IP x NDA/DEI/AI combination).
+
+Two numbers per backend:
+- cold: the first render of each combination, so it includes building the
+  skeleton (docx) or compiling the plan (xml).
+- warm: `--repeats` renders of a combination right after it was rendered once,
+  so the per-option cache is guaranteed to hold it.
+
+Both backends use caches of the same size (SKELETON_CACHE_SIZE), and all caches
+are cleared before each backend runs.
+
+Usage:
+    python benchmark.py [--repeats 3] [--stride 1] [--backends docx xml]
+"""
+
+import argparse
+import io
+import itertools
+import time
+
+import clauses
+import contract_generator
+import wordml
+
+OPTION_MATRIX = {
+    "role": list(clauses.current().cases("role")) + ["Custom"],
+    "compensation": ["Hourly", "Lump Sum", "Hybrid"],
+    "insurance": ["Standard", "Expanded", "Reduced"],
+    "dispute": ["Litigation", "Arbitration", "Mediation-then-Court"],
+    "ip_assignment": ["License", "Assignment"],
+    "include_nda": [True, False],
+    "include_dei": [True, False],
+    "ai_required": [True, False],
+}
+
+def option_records():
+    """One normalized data dict per option combination."""
+    names = list(OPTION_MATRIX)
+    for values in itertools.product(*OPTION_MATRIX.values()):
+        yield contract_generator.normalize_data(dict(zip(names, values)))
+
+def clear_caches():
+    contract_generator.get_skeleton.cache_clear()
+    wordml.get_plan.cache_clear()
+    wordml.static_parts.cache_clear()
+
+def render(data, backend):
+    start = time.perf_counter()
+    contract_generator.build_agreement(data, output_path=io.BytesIO(), backend=backend)
+    return time.perf_counter() - start
+
+def time_backend(records, backend, repeats):
+    """Return (cold, warm) per-document seconds for `backend` over `records`."""
+    clear_caches()
+    cold, warm = [], []
+    for data in records:
+        cold.append(render(data, backend))
+        warm.extend(render(data, backend) for _ in range(repeats))
+    return cold, warm
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "docs": len(ordered),
+        "total_s": sum(ordered),
+        "mean_ms": 1000 * sum(ordered) / len(ordered),
+        "p50_ms": 1000 * ordered[len(ordered) // 2],
+        "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare build_agreement backends across the option matrix.")
+    parser.add_argument("--repeats", type=int, default=3, help="warm renders per combination (default: 3)")
+    parser.add_argument("--stride", type=int, default=1, help="time every Nth combination only (default: 1, all)")
+    parser.add_argument("--backends", nargs="+", default=list(contract_generator.BACKENDS),
+                        choices=contract_generator.BACKENDS, help="backends to time (default: all)")
+    args = parser.parse_args(argv)
+
+    records = list(option_records())[::args.stride]
+    print(f"{len(records)} option combinations, {args.repeats} warm repeats each")
+    results = {}
+    for backend in args.backends:
+        cold, warm = time_backend(records, backend, args.repeats)
+        results[backend] = {"cold": summarize(cold), "warm": summarize(warm)}
+        for phase in ("cold", "warm"):
+            summary = results[backend][phase]
+            print(f"  {backend:<5} {phase}  {summary['mean_ms']:8.2f} ms/doc  p50 {summary['p50_ms']:7.2f} ms  "
+                  f"p95 {summary['p95_ms']:7.2f} ms  ({summary['docs'] / summary['total_s']:.1f} docs/sec)")
+    if "docx" in results and "xml" in results:
+        for phase in ("cold", "warm"):
+            speedup = results['docx'][phase]['mean_ms'] / results['xml'][phase]['mean_ms']
+            print(f"  xml speedup ({phase}): {speedup:.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,232 @@
+"""
+Powell CM Solutions - Clause Library
+------------------------------------
+Agreement text and clause selection, defined as data in templates/clauses.json.
+
+The JSON "document" is a list of blocks:
+- {"title": text} / {"heading": text, "level": 1} / {"p": text, "size": 11}
+- {"page_break": true} / {"rate_table": [header, header]} / {"rate_projection": true}
+- {"section": name}               timing boundary for metrics (see write_body)
+- {"choose": option, "cases": {value: [blocks]}, "default": [blocks]}
+- {"if": toggle, "then": [blocks], "else": [blocks]}
+
+Text may contain {{field}} slots, one of FIELDS. The file is validated and
+compiled once into nested tuples: unknown blocks, options, toggles or fields,
+non-integer sizes and levels, and a document where some clause selection has
+no rate_table, two of them, or more than one rate_projection raise ClauseError.
+plan(opts) resolves the choices for one option combination into a flat tuple
+of steps and memoizes it, so picking a variant is a dict lookup. current() re-reads the file when its mtime changes
+(checked at most every RELOAD_CHECK_SECONDS) and runs the on_reload() hooks so
+caches built from the old text are dropped.
+
+Usage:
+    for step in clauses.current().plan(opts):
+        ...
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "clauses.json")
+RELOAD_CHECK_SECONDS = 1.0
+
+OPTIONS = ("role", "compensation", "insurance", "dispute", "ip_assignment")
+TOGGLES = ("include_nda", "include_dei", "ai_required", "projection_years")
+# Fields a {{field}} slot may name; contract_generator.render_fields supplies their text.
+FIELDS = (
+    "effective_date", "client_name", "firm_name", "project_name", "role", "relationship",
+    "prime_reference", "term", "nte", "lump_sum", "monthly_cap", "net_days",
+    "termination_notice_days", "lol_text", "venue_county", "venue_state", "venue_city",
+    "annual_increase_cap",
+)
+PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+
+log = logging.getLogger(__name__)
+
+class ClauseError(ValueError):
+    """The clause library file is malformed."""
+
+class Library:
+    def __init__(self, document, digest):
+        self.digest = digest
+        self._cases = {}
+        self.root = self._compile(document, "document")
+        # The backends fill exactly one rate card and at most one projection per document.
+        fewest, most = self._count(self.root, "rate_table")
+        if fewest != 1 or most != 1:
+            raise ClauseError(f"document: every clause selection needs exactly one rate_table block, "
+                              f"found {fewest} to {most}")
+        if self._count(self.root, "rate_projection")[1] > 1:
+            raise ClauseError("document: a clause selection has more than one rate_projection block")
+        self._plans = {}
+
+    def cases(self, option):
+        """Values of `option` that have their own text (anything else takes the default)."""
+        return self._cases.get(option, ())
+
+    def plan(self, opts):
+        """Flat tuple of steps for an opts dict with OPTIONS and TOGGLES keys."""
+        key = tuple(opts[name] for name in OPTIONS + TOGGLES)
+        plan = self._plans.get(key)
+        if plan is None:
+            steps = []
+            self._resolve(self.root, opts, steps)
+            plan = self._plans[key] = tuple(steps)
+        return plan
+
+    def _resolve(self, compiled, opts, steps):
+        for item in compiled:
+            kind = item[0]
+            if kind == "choose":
+                _, option, cases, default = item
+                self._resolve(cases.get(opts[option], default), opts, steps)
+            elif kind == "if":
+                _, toggle, then, otherwise = item
+                self._resolve(then if opts[toggle] else otherwise, opts, steps)
+            else:
+                steps.append(item)
+
+    def _count(self, compiled, step_kind):
+        """(fewest, most) `step_kind` steps any plan of `compiled` can contain."""
+        fewest = most = 0
+        for item in compiled:
+            kind = item[0]
+            if kind == step_kind:
+                fewest, most = fewest + 1, most + 1
+            elif kind in ("choose", "if"):
+                branches = list(item[2].values()) + [item[3]] if kind == "choose" else [item[2], item[3]]
+                counts = [self._count(branch, step_kind) for branch in branches]
+                fewest += min(count[0] for count in counts)
+                most += max(count[1] for count in counts)
+        return fewest, most
+
+    def _text(self, block, key, at):
+        text = block[key]
+        if not isinstance(text, str):
+            raise ClauseError(f"{at}: {key!r} must be a string")
+        unknown = [name for name in PLACEHOLDER_RE.findall(text) if name not in FIELDS]
+        if unknown:
+            raise ClauseError(f"{at}: unknown field {{{{{unknown[0]}}}}}; expected one of {FIELDS}")
+        if "{{" in PLACEHOLDER_RE.sub("", text) or "}}" in PLACEHOLDER_RE.sub("", text):
+            raise ClauseError(f"{at}: malformed {{{{field}}}} slot in {text!r}")
+        return text
+
+    def _int(self, block, key, default, at, low, high):
+        value = block.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+            raise ClauseError(f"{at}: {key!r} must be an integer from {low} to {high}, got {value!r}")
+        return value
+
+    def _compile(self, blocks, where):
+        if not isinstance(blocks, list):
+            raise ClauseError(f"{where}: expected a list of blocks")
+        out = []
+        for i, block in enumerate(blocks):
+            at = f"{where}[{i}]"
+            if not isinstance(block, dict):
+                raise ClauseError(f"{at}: expected an object")
+            if "p" in block:
+                out.append(("p", self._text(block, "p", at), self._int(block, "size", 11, at, 1, 72)))
+            elif "heading" in block:
+                out.append(("heading", self._text(block, "heading", at), self._int(block, "level", 1, at, 1, 9)))
+            elif "title" in block:
+                out.append(("title", self._text(block, "title", at)))
+            elif "page_break" in block:
+                out.append(("page_break",))
+            elif "rate_projection" in block:
+                out.append(("rate_projection",))
+            elif "rate_table" in block:
+                headers = block["rate_table"]
+                if not isinstance(headers, list) or len(headers) != 2:
+                    raise ClauseError(f"{at}: 'rate_table' must list two column headers")
+                out.append(("rate_table", tuple(self._text({"header": h}, "header", at) for h in headers)))
+            elif "section" in block:
+                out.append(("section", str(block["section"])))
+            elif "choose" in block:
+                option = block["choose"]
+                if option not in OPTIONS:
+                    raise ClauseError(f"{at}: unknown option {option!r}; expected one of {OPTIONS}")
+                if not isinstance(block.get("cases", {}), dict):
+                    raise ClauseError(f"{at}: 'cases' must be an object of value: [blocks]")
+                cases = {value: self._compile(sub, f"{at}.cases[{value!r}]")
+                         for value, sub in block.get("cases", {}).items()}
+                names = self._cases.setdefault(option, [])
+                names.extend(value for value in cases if value not in names)
+                out.append(("choose", option, cases, self._compile(block.get("default", []), f"{at}.default")))
+            elif "if" in block:
+                toggle = block["if"]
+                if toggle not in TOGGLES:
+                    raise ClauseError(f"{at}: unknown toggle {toggle!r}; expected one of {TOGGLES}")
+                out.append(("if", toggle, self._compile(block.get("then", []), f"{at}.then"),
+                            self._compile(block.get("else", []), f"{at}.else")))
+            else:
+                raise ClauseError(f"{at}: unknown block {sorted(block)}")
+        return tuple(out)
+
+def load(path=LIBRARY_PATH):
+    with open(path, 'rb') as fh:
+        raw = fh.read()
+    try:
+        spec = json.loads(raw.decode('utf-8'))
+    except ValueError as e:
+        raise ClauseError(f"{path}: {e}") from None
+    if not isinstance(spec, dict):
+        raise ClauseError(f"{path}: expected an object with a \"document\" list")
+    try:
+        return Library(spec.get("document"), hashlib.sha256(raw).hexdigest()[:12])
+    except ClauseError as e:
+        raise ClauseError(f"{path}: {e}") from None
+    except (TypeError, ValueError, AttributeError, KeyError) as e:
+        raise ClauseError(f"{path}: {type(e).__name__}: {e}") from None
+
+# ---------------------------- Hot reload ----------------------------
+
+_lock = threading.Lock()
+_library = None
+_mtime = None
+_checked = 0.0
+_error = None  # why the file at _mtime could not be loaded
+_hooks = []
+
+def on_reload(fn):
+    """Call `fn()` whenever the library file is reloaded with new content."""
+    _hooks.append(fn)
+    return fn
+
+def current():
+    """The loaded library, re-read first if the file changed since the last check."""
+    global _library, _mtime, _checked, _error
+    now = time.monotonic()
+    if _library is not None and now - _checked < RELOAD_CHECK_SECONDS:
+        return _library
+    with _lock:
+        _checked = now
+        try:
+            mtime = os.stat(LIBRARY_PATH).st_mtime_ns
+        except OSError:
+            if _library is None:
+                raise
+            return _library
+        if mtime == _mtime:
+            if _library is None:
+                raise _error
+            return _library
+        try:
+            library = load(LIBRARY_PATH)
+        except (OSError, ClauseError) as e:
+            _mtime, _error = mtime, e  # not re-read until the file changes again
+            if _library is None:
+                raise
+            log.error("clause library not reloaded, keeping the previous version: %s", e)
+            return _library
+        changed = _library is not None and library.digest != _library.digest
+        _library, _mtime = library, mtime
+    if changed:
+        for fn in _hooks:
+            fn()
+    return _library
@@ -8,39 +8,123 @@ Requirements:
 - Python 3.x
 - python-docx  (pip install python-docx)
 
+python-docx (with lxml), docx_package and rate_schedule are imported on first
+use, so the prompts come up before they load; warm_up() loads them and the
+default skeleton up front. --profile-startup prints where startup time goes.
+
 Usage:
 - Run:  python contract_generator.py
 - Answer prompts (press Enter to accept defaults).
 - Output: Generated_Agreement_YYYYMMDD_HHMM.docx
+
+Batch:
+- Run:  python contract_generator.py --batch deals.jsonl --out dir/ --workers N [--backend xml]
+  [--zip-level 0-9] [--size-report]
+- One agreement per JSONL line or CSV row; missing fields take the prompt defaults.
+  In CSV, the `rates` column holds a JSON object of role -> hourly rate.
 """
 
-from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+import argparse
+import copy
+import csv
+import io
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
 from datetime import datetime
+from functools import lru_cache
+
+import clauses
+import metrics
+
+# ---------------------------- Defaults ----------------------------
+
+DEFAULTS = {
+    "effective_date": "____ ______, 20__",
+    "client_name": "[Client Legal Name]",
+    "firm_name": "Powell CM Solutions, LLC",
+    "project_name": "[Project Name]",
+    "term": "[Start – End]",
+    "role": "Program Manager",
+    "relationship": "Prime",
+    "prime_reference": "",
+    "compensation": "Hourly",
+    "nte": 0.0,
+    "lump_sum": 0.0,
+    "monthly_cap": 0.0,
+    "insurance": "Standard",
+    "dispute": "Litigation",
+    "venue_county": "Cook County",
+    "venue_state": "Illinois",
+    "venue_city": "Chicago",
+    "net_days": 30,
+    "termination_notice_days": 15,
+    "lol_multiplier": 2,
+    "annual_increase_cap": 4,
+    "ip_assignment": "License",  # or "Assignment"
+    "include_nda": True,
+    "include_dei": True,
+    "ai_required": True,  # Additional Insured language
+    "projection_years": 0,  # 1 to MAX_PROJECTION_YEARS adds a projected-rates table to Exhibit E
+    "rates": {
+        "Principal / Executive": 250.00,
+        "Senior Project Manager": 200.00,
+        "Project Manager": 175.00,
+        "Project Engineer": 150.00,
+        "Coordinator / Admin": 100.00
+    }
+}
+
+# Bounds (inclusive) normalize_data enforces; templates/form.html uses the same min/max.
+MAX_PROJECTION_YEARS = 10
+LIMITS = {"projection_years": (0, MAX_PROJECTION_YEARS)}
+
+# Values the prompts offer for each option (templates/form.html lists the same).
+CHOICES = {
+    "role": ["Owner’s Representative", "Program Manager", "Construction Manager (Advisor)", "Developer Advisory",
+             "Subconsultant"],
+    "relationship": ["Prime", "Subconsultant"],
+    "compensation": ["Hourly", "Lump Sum", "Hybrid"],
+    "insurance": ["Standard", "Expanded", "Reduced"],
+    "dispute": ["Litigation", "Arbitration", "Mediation-then-Court"],
+    "ip_assignment": ["License", "Assignment"],
+}
 
 # ---------------------------- Helpers ----------------------------
 
-def add_paragraph(doc, text, size=11):
-    p = doc.add_paragraph(text)
-    if p.runs:
-        p.runs[0].font.name = 'Calibri'
+# Characters XML 1.0 does not allow, even escaped (lxml refuses them).
+INVALID_XML_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+def clean_text(value):
+    return INVALID_XML_RE.sub("", str(value))
+
+def add_paragraph(doc, text, size=None):
+    import docx_package
+    size = size or docx_package.BODY_SIZE
+    style = docx_package.BODY_STYLES.get(size)
+    p = doc.add_paragraph(text, style or docx_package.BODY_STYLES[docx_package.BODY_SIZE])
+    if style is None and p.runs:
+        from docx.shared import Pt
         p.runs[0].font.size = Pt(size)
     return p
 
 def add_heading(doc, text, level=1):
     return doc.add_heading(text, level=level)
 
-def add_table_rate_card(doc, rates):
+def fill_rate_card(table, rates):
+    import rate_schedule
+    return rate_schedule.append_rows(table, rate_schedule.rate_rows(rates, clean_text))
+
+def add_table_rate_card(doc, rates, headers=('Role', 'Hourly Rate (USD)')):
     table = doc.add_table(rows=1, cols=2)
     hdr_cells = table.rows[0].cells
-    hdr_cells[0].text = 'Role'
-    hdr_cells[1].text = 'Hourly Rate (USD)'
-    for role, rate in rates.items():
-        row_cells = table.add_row().cells
-        row_cells[0].text = role
-        row_cells[1].text = f"${float(rate):,.2f}"
-    return table
+    hdr_cells[0].text = headers[0]
+    hdr_cells[1].text = headers[1]
+    return fill_rate_card(table, rates)
 
 def menu_choice(prompt, options, default_idx=0):
     print(prompt)
@@ -61,259 +145,418 @@ def prompt_text(prompt, default=""):
     raw = input(f"{prompt} [{default}]: ").strip()
     return raw if raw else default
 
+def prompt_number(prompt, default, cast=float, limits=None):
+    """Ask until the answer is blank (the default) or a number, within `limits` (low, high) if given."""
+    while True:
+        raw = input(f"{prompt} [{default}]: ").strip()
+        try:
+            value = to_number(raw or default, cast)
+        except DataError:
+            print(f"  Please enter {'a whole number' if cast is int else 'a number'}.")
+            continue
+        if limits and not limits[0] <= value <= limits[1]:
+            print(f"  Please enter a number from {limits[0]} to {limits[1]}.")
+            continue
+        return value
+
 def prompt_money(prompt, default="0"):
-    raw = input(f"{prompt} [{default}]: ").replace(",", "").strip()
-    try:
-        return float(raw) if raw else float(default or 0)
-    except:
-        return float(default or 0)
+    return prompt_number(prompt, default or "0")
 
 def timestamp_suffix():
     return datetime.now().strftime("%Y%m%d_%H%M")
 
-# ---------------------------- Builder ----------------------------
+def to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("yes", "y", "true", "1", "on")
+    return bool(value)
 
-def build_agreement(data):
-    doc = Document()
-
-    # Title
-    h = doc.add_heading('Master Professional Services Agreement (Generated)', 0)
-    h.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Parties / Header
-    add_paragraph(doc, f"This Agreement is entered into as of {data['effective_date']} by and between "
-                       f"{data['client_name']} (\"Client\") and {data['firm_name']} (\"Consultant\").")
-    add_paragraph(doc, "Client and Consultant are together the “Parties.”")
-
-    # Work Order Summary
-    add_heading(doc, 'Work Order Summary', level=1)
-    add_paragraph(doc, f"Project: {data['project_name']}")
-    add_paragraph(doc, f"Role: {data['role']}")
-    add_paragraph(doc, f"Relationship: {data['relationship']}")
-    add_paragraph(doc, f"Prime Contract Reference (if Sub): {data['prime_reference']}")
-    add_paragraph(doc, f"Term: {data['term']}")
-
-    # Recitals
-    add_heading(doc, 'Recitals', level=1)
-    add_paragraph(doc, "A. Client desires to engage Consultant to provide program management, construction management "
-                       "(as advisor), owner’s representation, developer advisory, and/or related professional consulting services.")
-    add_paragraph(doc, "B. Consultant is duly qualified and willing to perform such services under the terms of this Agreement.")
-
-    # Articles
-    add_heading(doc, 'Article 1 – Master Engagement & Work Orders', level=1)
-    add_paragraph(doc, "1.1 Master Agreement. This Agreement sets general terms for all services. Specific scope, fees, "
-                       "schedules, and special terms will be set forth in written Work Orders executed by the Parties and incorporated herein.")
-    add_paragraph(doc, "1.2 Prime/Sub Flexibility. Consultant may perform services as prime directly for Client or as a subconsultant, "
-                       "as indicated in the Work Order. Flow‑down obligations from any prime contract apply to Consultant only to the extent "
-                       "expressly identified in the Work Order.")
-    add_paragraph(doc, "1.3 Independent Contractor; No Authority to Bind. Consultant is an independent contractor and shall not bind Client without written authority.")
-
-    add_heading(doc, 'Article 2 – Standard of Care; Personnel', level=1)
-    add_paragraph(doc, "2.1 Standard of Care. Consultant shall perform services with the care and skill ordinarily used by similar professionals "
-                       "practicing under similar conditions at the same time and locality.")
-    add_paragraph(doc, "2.2 Key Personnel. If key personnel are identified, Consultant shall not reassign them without reasonable notice and suitable replacement.")
-
-    add_heading(doc, 'Article 3 – Compensation & Payment', level=1)
-    if data['compensation'] == "Hourly":
-        add_paragraph(doc, f"3.1 Fees. Hourly per Rate Exhibit E with a Not‑to‑Exceed amount of ${data['nte']:,.2f} without prior written approval.")
-    elif data['compensation'] == "Lump Sum":
-        add_paragraph(doc, f"3.1 Fees. Lump Sum fee of ${data['lump_sum']:,.2f}, payable per milestones set forth in Exhibit B.")
-    else:
-        add_paragraph(doc, f"3.1 Fees. Hybrid: Hourly per Exhibit E with a monthly cap of ${data['monthly_cap']:,.2f}.")
-    add_paragraph(doc, "3.2 Reimbursable Expenses. Billed at actual cost per Exhibit D unless otherwise stated.")
-    add_paragraph(doc, f"3.3 Invoices & Payment. Invoices monthly; payment due net {data['net_days']}. "
-                       "Overdue balances accrue interest at 1% per month or the maximum allowed by law.")
-
-    add_heading(doc, 'Article 4 – Insurance', level=1)
-    if data['insurance'] == "Standard":
-        add_paragraph(doc, "GL $1M each / $2M aggregate; Auto $1M CSL; WC Statutory; Employers $500k; Professional Liability $2M aggregate.")
-    elif data['insurance'] == "Expanded":
-        add_paragraph(doc, "GL $2M each / $4M aggregate; Auto $1M CSL; WC Statutory; Employers $1M; Professional Liability $5M aggregate.")
-    else:
-        add_paragraph(doc, "GL $1M each; Auto N/A if no driving; WC Statutory; Employers $500k; Professional Liability $1M aggregate.")
-    if data['ai_required']:
-        add_paragraph(doc, "Additional Insured status will be provided where required by the Work Order or prime contract, to the extent commercially available.")
+class DataError(ValueError):
+    """A field of the agreement data has a value that cannot be used."""
 
-    add_heading(doc, 'Article 5 – Ownership; License; Confidentiality', level=1)
-    if data['ip_assignment'] == "License":
-        add_paragraph(doc, "5.1 Instruments of Service. Upon full payment, Client receives a non‑exclusive license to use deliverables for the Project identified in the Work Order. Consultant retains IP rights.")
-    else:
-        add_paragraph(doc, "5.1 Instruments of Service. Upon full payment, Consultant assigns to Client the ownership of deliverables for the Project identified in the Work Order (excluding Consultant’s pre‑existing tools).")
-    add_paragraph(doc, "5.2 Confidentiality. Each Party shall keep in confidence non‑public information received from the other and use it solely for the Project.")
-    if data['include_nda']:
-        add_paragraph(doc, "5.3 Mutual NDA. The Parties agree not to disclose Confidential Information except to those with a need to know who are bound by confidentiality obligations; "
-                           "to protect such information with at least the same degree of care as used to protect their own; and to return or destroy such information upon written request, "
-                           "subject to legal and record‑keeping requirements.")
-
-    add_heading(doc, 'Article 6 – Indemnification; Limitation of Liability', level=1)
-    add_paragraph(doc, "6.1 Consultant Indemnity. To the extent caused by Consultant’s negligence, gross negligence, or willful misconduct, Consultant shall indemnify and hold harmless Client from third‑party claims for bodily injury, death, or tangible property damage. This indemnity excludes Client’s negligence.")
-    add_paragraph(doc, "6.2 Client Indemnity. Client shall indemnify and hold harmless Consultant from third‑party claims to the extent caused by Client’s negligence or willful misconduct.")
-    lol_text = f"{data['lol_multiplier']}x the fees paid for the applicable Work Order" if data['lol_multiplier'] else "two (2) times the fees paid"
-    add_paragraph(doc, f"6.3 Limitation of Liability. Consultant’s aggregate liability under this Agreement and any Work Order shall not exceed {lol_text}. "
-                       "Neither Party shall be liable for consequential, incidental, or special damages.")
-    if data['include_dei']:
-        add_paragraph(doc, "6.4 Inclusion & Non‑Discrimination. Consultant shall endeavor to utilize a diverse workforce and comply with applicable non‑discrimination laws and Client’s reasonable inclusion objectives.")
-
-    add_heading(doc, 'Article 7 – Changes; Suspension; Termination', level=1)
-    add_paragraph(doc, "7.1 Changes require written authorization via amendment to the Work Order.")
-    add_paragraph(doc, "7.2 Suspension. Client may suspend upon written notice; Consultant shall be paid for work performed and reasonable demobilization/remobilization costs.")
-    add_paragraph(doc, f"7.3 Termination for Convenience. Either Party may terminate a Work Order on {data['termination_notice_days']} days’ written notice. Consultant shall be paid for services performed and costs incurred through termination.")
-
-    add_heading(doc, 'Article 8 – Dispute Resolution', level=1)
-    if data['dispute'] == "Litigation":
-        add_paragraph(doc, f"Disputes shall be resolved in the state courts of {data['venue_county']}, {data['venue_state']}. Jury trial waived to the extent permitted by law.")
-    elif data['dispute'] == "Arbitration":
-        add_paragraph(doc, f"Disputes shall be mediated first; if unresolved, finally resolved by binding arbitration under the AAA Construction Industry Rules. Seat: {data['venue_city']}, {data['venue_state']}.")
-    else:
-        add_paragraph(doc, f"Disputes shall be mediated first; if unresolved, litigated in the state courts of {data['venue_county']}, {data['venue_state']}.")
-
-    add_heading(doc, 'Article 9 – Miscellaneous', level=1)
-    add_paragraph(doc, f"9.1 Governing Law. The laws of {data['venue_state']} apply.")
-    add_paragraph(doc, "9.2 Assignment. Neither Party may assign without written consent, except to affiliates in connection with a merger, acquisition, or reorganization.")
-    add_paragraph(doc, "9.3 Entire Agreement. This Agreement, together with applicable Work Orders and Exhibits, constitutes the entire agreement between the Parties.")
-
-    # Scope Library
-    add_heading(doc, 'Exhibit A – Scope of Services (Role-Based Library)', level=1)
-    scope_map = {
-        "Owner’s Representative": [
-            "Design phase coordination; value analysis; constructability; permitting roadmap.",
-            "Procurement support (RFPs, bid leveling), recommendations; contract administration support.",
-            "Construction monitoring; pay app/change order review; schedule analysis; punch/turnover oversight."
-        ],
-        "Program Manager": [
-            "PMO governance; executive dashboards; stage‑gate reviews; RAID/risk tracking.",
-            "Master schedule (L1–L3); document control; cost/schedule reporting; baseline & forecasts."
-        ],
-        "Construction Manager (Advisor)": [
-            "Preconstruction estimating; budget/schedule alignment; logistics planning.",
-            "Submittal/RFI workflow; reporting cadence; change management support; claims avoidance."
-        ],
-        "Developer Advisory": [
-            "Feasibility and entitlement support; utilities coordination; community engagement planning.",
-            "Pro forma inputs; delivery strategy; risk register and mitigation planning; lender/partner reporting."
-        ],
-        "Subconsultant": [
-            "Discipline‑specific tasks aligned with prime contract flow‑downs.",
-            "Coordinate deliverables and schedule under prime consultant’s direction."
-        ]
+def to_number(value, cast=float, field=None):
+    """`value` ("1,250", "$300", 12) as a finite float or, with cast=int, a whole number; raises DataError."""
+    try:
+        number = float(str(value).replace(",", "").replace("$", "").strip())
+    except (TypeError, ValueError):
+        number = None
+    if number is None or not math.isfinite(number) or (cast is int and not number.is_integer()):
+        kind = "a whole number" if cast is int else "a number"
+        raise DataError(f"{field + ': ' if field else ''}expected {kind}, got {value!r}")
+    return cast(number)
+
+def normalize_data(data):
+    """Return a complete build_agreement() dict: blanks take DEFAULTS, numbers and toggles are coerced.
+
+    Raises DataError for values that are not blank but cannot be coerced (e.g. nte="abc").
+    """
+    out = {}
+    for key, default in DEFAULTS.items():
+        value = data.get(key)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            value = default
+        if isinstance(default, bool):
+            value = to_bool(value)
+        elif isinstance(default, float):
+            value = to_number(value, field=key)
+        elif isinstance(default, int):
+            value = to_number(value, int, field=key)
+        elif isinstance(default, dict):
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    raise DataError(f"{key}: expected a JSON object, got {value!r}") from None
+            if not isinstance(value, dict):
+                raise DataError(f"{key}: expected an object of role: rate, got {type(value).__name__}")
+            value = {str(k): to_number(v, field=f"{key}[{k!r}]") for k, v in value.items()}
+        else:
+            value = str(value).strip()
+        if key in LIMITS:
+            check_limits(key, value)
+        out[key] = value
+    return out
+
+def check_limits(key, value):
+    low, high = LIMITS[key]
+    if not low <= value <= high:
+        raise DataError(f"{key}: must be from {low} to {high}, got {value!r}")
+    return value
+
+# ---------------------------- Builder ----------------------------
+#
+# More than 90% of the agreement is fixed boilerplate that only depends on the
+# selected options (compensation, insurance, dispute, IP, toggles and role).
+# That boilerplate is built once per option combination as a "skeleton" whose
+# variable text is written as {{field}} placeholders. Each call clones the
+# cached skeleton, fills the placeholders and appends the rate card rows.
+
+FIELD_NAMES = clauses.FIELDS
+PLACEHOLDERS = {name: "{{%s}}" % name for name in FIELD_NAMES}
+PLACEHOLDER_RE = clauses.PLACEHOLDER_RE
+# Paragraph the projected-rates table replaces; see fill_projection.
+PROJECTION_MARKER = "{{rate_projection}}"
+# The default template's text width (6 in), split evenly like add_table does.
+TEXT_WIDTH_TWIPS = 8640
+
+def option_key(data):
+    """Normalized tuple of the options that change the boilerplate text.
+
+    Options without their own clause library case become None (the default text).
+    """
+    library = clauses.current()
+    values = {name: data.get(name, DEFAULTS[name]) for name in clauses.OPTIONS + clauses.TOGGLES}
+    return (tuple(values[name] if values[name] in library.cases(name) else None for name in clauses.OPTIONS)
+            + tuple(bool(values[name]) for name in clauses.TOGGLES))
+
+def render_fields(data):
+    """Formatted text for every {{field}} placeholder in the skeleton."""
+    return {
+        "effective_date": clean_text(data['effective_date']),
+        "client_name": clean_text(data['client_name']),
+        "firm_name": clean_text(data['firm_name']),
+        "project_name": clean_text(data['project_name']),
+        "role": clean_text(data['role']),
+        "relationship": clean_text(data['relationship']),
+        "prime_reference": clean_text(data['prime_reference']),
+        "term": clean_text(data['term']),
+        "nte": f"{data['nte']:,.2f}",
+        "lump_sum": f"{data['lump_sum']:,.2f}",
+        "monthly_cap": f"{data['monthly_cap']:,.2f}",
+        "net_days": clean_text(data['net_days']),
+        "termination_notice_days": clean_text(data['termination_notice_days']),
+        "lol_text": f"{data['lol_multiplier']}x the fees paid for the applicable Work Order" if data['lol_multiplier'] else "two (2) times the fees paid",
+        "venue_county": clean_text(data['venue_county']),
+        "venue_state": clean_text(data['venue_state']),
+        "venue_city": clean_text(data['venue_city']),
+        "annual_increase_cap": clean_text(data['annual_increase_cap']),
     }
-    chosen = scope_map.get(data['role'], ["Custom scope to be attached."])
-    for item in chosen:
-        add_paragraph(doc, "• " + item)
-
-    # Compensation
-    add_heading(doc, 'Exhibit B – Compensation', level=1)
-    if data['compensation'] == "Hourly":
-        add_paragraph(doc, f"Hourly per Exhibit E; Not‑to‑Exceed ${data['nte']:,.2f} without prior written approval.")
-    elif data['compensation'] == "Lump Sum":
-        add_paragraph(doc, f"Lump Sum Fee: ${data['lump_sum']:,.2f}, payable per agreed milestones.")
+
+def write_body(doc, opts, f):
+    """Write the agreement body from the clause library; `opts` selects clauses, `f` supplies field text."""
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    sub = lambda m: f.get(m.group(1), m.group(0))
+    sections = metrics.laps("write_body.")
+    for step in clauses.current().plan(opts):
+        kind = step[0]
+        if kind == "p":
+            add_paragraph(doc, PLACEHOLDER_RE.sub(sub, step[1]), size=step[2])
+        elif kind == "heading":
+            add_heading(doc, PLACEHOLDER_RE.sub(sub, step[1]), level=step[2])
+        elif kind == "title":
+            doc.add_heading(PLACEHOLDER_RE.sub(sub, step[1]), 0).alignment = WD_ALIGN_PARAGRAPH.CENTER
+        elif kind == "page_break":
+            doc.add_page_break()
+        elif kind == "rate_table":
+            # Rows are appended per document, see fill_rate_card.
+            add_table_rate_card(doc, {}, headers=step[1])
+        elif kind == "rate_projection":
+            add_paragraph(doc, PROJECTION_MARKER)
+        elif kind == "section":
+            sections.lap(step[1])
+    sections.close()
+
+# Each skeleton holds a whole python-docx package (~0.2 MB with the stripped
+# docx_package template), so only the most recently used option combinations are
+# kept; the bundled clause library has 2592.
+SKELETON_CACHE_SIZE = 64
+
+def build_skeleton(key):
+    """Build the placeholder document for an option_key() tuple."""
+    import docx_package
+    doc = docx_package.new_document()
+    write_body(doc, dict(zip(clauses.OPTIONS + clauses.TOGGLES, key)), PLACEHOLDERS)
+    return doc
+
+@lru_cache(maxsize=SKELETON_CACHE_SIZE)
+def get_skeleton(key):
+    return build_skeleton(key)
+
+clauses.on_reload(get_skeleton.cache_clear)
+
+def clone_skeleton(skeleton):
+    """Copy a skeleton document, sharing its read-only package parts (styles, settings, ...)."""
+    memo = {}
+    for part in skeleton.part.package.iter_parts():
+        element = getattr(part, '_element', None)
+        if part is not skeleton.part and element is not None:
+            memo[id(element)] = element
+    # Copy the document tree first so the cached body proxy maps onto the new tree.
+    element = copy.deepcopy(skeleton.element)
+    memo[id(skeleton.element)] = element
+    memo[id(skeleton.element.body)] = element.body
+    return copy.deepcopy(skeleton, memo)
+
+def fill_placeholders(doc, fields):
+    from docx.oxml.ns import qn
+    sub = lambda m: fields.get(m.group(1), m.group(0))
+    for t in doc.element.body.iter(qn('w:t')):
+        if t.text and '{{' in t.text:
+            t.text = PLACEHOLDER_RE.sub(sub, t.text)
+
+def projection_xml(data):
+    import rate_schedule
+    years = check_limits('projection_years', int(data['projection_years']))
+    header = rate_schedule.projection_header(years)
+    rows = rate_schedule.projection_rows(data['rates'], data['annual_increase_cap'], years, clean_text)
+    return rate_schedule.table_xml(header, rows, TEXT_WIDTH_TWIPS // len(header))
+
+def fill_projection(doc, data):
+    """Replace the PROJECTION_MARKER paragraph with the projected-rates table."""
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls, qn
+    for t in doc.element.body.iter(qn('w:t')):
+        if t.text == PROJECTION_MARKER:
+            p = next(t.iterancestors(qn('w:p')))
+            p.addnext(parse_xml(projection_xml(data).replace("<w:tbl>", f"<w:tbl {nsdecls('w')}>", 1)))
+            p.getparent().remove(p)
+            return
+
+def render_document(data):
+    with metrics.span("skeleton"):
+        doc = clone_skeleton(get_skeleton(option_key(data)))
+    with metrics.span("fill_placeholders"):
+        fill_placeholders(doc, render_fields(data))
+    with metrics.span("rate_table"):
+        fill_rate_card(doc.tables[0], data['rates'])
+    if data.get('projection_years'):
+        with metrics.span("rate_projection"):
+            fill_projection(doc, data)
+    return doc
+
+BACKENDS = ("docx", "xml")
+
+# SQLite index of the agreements written to files (archive.py); set AGREEMENT_ARCHIVE= (empty) to disable.
+ARCHIVE_PATH = os.environ.get("AGREEMENT_ARCHIVE", "agreements.sqlite3")
+
+def build_agreement(data, output_path=None, backend="docx", level=None, archive=True):
+    """Render `data` and save it to `output_path`, a file path or writable binary stream.
+
+    Without `output_path` the agreement is saved as Generated_Agreement_<timestamp>.docx
+    in the working directory. `backend` is "docx" (python-docx object model) or "xml"
+    (direct WordprocessingML emitter in wordml.py; same document parts, less overhead).
+    `level` is the zip deflate level, docx_package.ZIP_LEVEL by default.
+    Documents written to a path are recorded in the archive index (ARCHIVE_PATH)
+    unless `archive` is false (run_batch records its results in bulk instead).
+    Returns where the document was written.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}; expected one of {BACKENDS}")
+    if output_path is None:
+        output_path = f"Generated_Agreement_{timestamp_suffix()}.docx"
+    if backend == "xml":
+        import wordml  # imports this module, so it cannot be imported at the top
+        wordml.save(data, output_path, level)
     else:
-        add_paragraph(doc, f"Hybrid: Hourly per Exhibit E with monthly cap ${data['monthly_cap']:,.2f}.")
-
-    # Insurance
-    add_heading(doc, 'Exhibit C – Insurance', level=1)
-    if data['insurance'] == "Standard":
-        add_paragraph(doc, "GL $1M each / $2M agg; Auto $1M CSL; WC Statutory; Employers $500k; Professional $2M agg.")
-    elif data['insurance'] == "Expanded":
-        add_paragraph(doc, "GL $2M each / $4M agg; Auto $1M CSL; WC Statutory; Employers $1M; Professional $5M agg.")
+        import docx_package
+        doc = render_document(data)
+        with metrics.span("save"):
+            docx_package.save(doc, output_path, level)
+    if metrics.ENABLED:
+        metrics.record_document(backend, option_key(data), output_size(output_path))
+    if archive and ARCHIVE_PATH and not hasattr(output_path, 'write'):
+        import archive as archive_index  # imports this module too
+        archive_index.record(data, output_path, backend)
+    return output_path
+
+def output_size(output_path):
+    try:
+        return output_path.tell() if hasattr(output_path, 'write') else os.path.getsize(output_path)
+    except (OSError, ValueError):
+        return None
+
+def build_agreement_bytes(data, backend="docx"):
+    buf = io.BytesIO()
+    build_agreement(data, output_path=buf, backend=backend)
+    return buf.getvalue()
+
+def warm_up(backend="docx"):
+    """Load what the first agreement would otherwise wait for: python-docx, the package
+    template and the default option combination's skeleton (or wordml plan and parts).
+
+    Call it before forking workers (app.py at import, run_batch before its process
+    pool) so every worker starts with the result instead of building it again.
+    """
+    import docx_package
+    key = option_key(normalize_data({}))
+    if backend == "xml":
+        import wordml
+        wordml.static_parts(docx_package.ZIP_LEVEL)
+        wordml.get_plan(key)
     else:
-        add_paragraph(doc, "GL $1M each; Auto N/A if no driving; WC Statutory; Employers $500k; Professional $1M agg.")
-
-    # Reimbursables
-    add_heading(doc, 'Exhibit D – Reimbursable Expenses', level=1)
-    add_paragraph(doc, "Travel (coach airfare), lodging at GSA per diem, mileage at IRS rate, meals per diem, printing/ repro, permits/fees, courier/delivery, "
-                       "pre‑approved software/hosting, and meeting/event costs. Billed at actual cost, no markup.")
-
-    # Rate card
-    add_heading(doc, 'Exhibit E – Rate Schedule', level=1)
-    add_paragraph(doc, "Standard rates (edit in prompts or here):")
-    add_table_rate_card(doc, data['rates'])
-    add_paragraph(doc, f"Annual adjustment: up to {data['annual_increase_cap']}% with thirty (30) days’ notice, unless otherwise agreed.")
-
-    # Disputes
-    add_heading(doc, 'Exhibit F – Dispute Resolution', level=1)
-    if data['dispute'] == "Litigation":
-        add_paragraph(doc, f"Exclusive venue and jurisdiction: state courts of {data['venue_county']}, {data['venue_state']}.")
-    elif data['dispute'] == "Arbitration":
-        add_paragraph(doc, f"Mediation first; if unresolved, binding arbitration (AAA Construction Industry Rules). Seat: {data['venue_city']}, {data['venue_state']}.")
+        get_skeleton(key)
+
+# ---------------------------- Batch ----------------------------
+
+def read_records(path):
+    """Yield (row_number, record) from a .csv or .jsonl file; unparsable lines yield the error instead."""
+    with open(path, newline='', encoding='utf-8') as fh:
+        if path.lower().endswith('.csv'):
+            for row_number, record in enumerate(csv.DictReader(fh), 1):
+                yield row_number, record
+        else:
+            row_number = 0
+            for line in fh:
+                if not line.strip():
+                    continue
+                row_number += 1
+                try:
+                    yield row_number, json.loads(line)
+                except ValueError as e:
+                    yield row_number, e
+
+def batch_job(job):
+    row_number, record, out_path, backend, level = job
+    try:
+        if isinstance(record, Exception):
+            raise record
+        build_agreement(normalize_data(record), output_path=out_path, backend=backend, level=level, archive=False)
+        return row_number, out_path, None
+    except Exception as e:
+        return row_number, out_path, f"{type(e).__name__}: {e}"
+
+def run_batch(path, out_dir=".", workers=None, backend="docx", level=None, size_report=False):
+    workers = workers or os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    os.makedirs(out_dir, exist_ok=True)
+    # One timestamp per run plus the row number keeps every name unique.
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    jobs = [(row_number, record, os.path.join(out_dir, f"Generated_Agreement_{stamp}_{row_number:05d}.docx"), backend, level)
+            for row_number, record in read_records(path)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [batch_job(job) for job in jobs]
     else:
-        add_paragraph(doc, f"Mediation first; if unresolved, litigation in state courts of {data['venue_county']}, {data['venue_state']}.")
-
-    # Signature Blocks
-    doc.add_page_break()
-    add_heading(doc, 'Signatures', level=1)
-    add_paragraph(doc, f"{data['client_name']}", size=12)
-    add_paragraph(doc, "By: _______________________________")
-    add_paragraph(doc, "Name: _____________________________")
-    add_paragraph(doc, "Title: ______________________________")
-    add_paragraph(doc, "Date: ______________________________")
-    add_paragraph(doc, "")
-    add_paragraph(doc, f"{data['firm_name']}", size=12)
-    add_paragraph(doc, "By: _______________________________")
-    add_paragraph(doc, "Name: _____________________________")
-    add_paragraph(doc, "Title: ______________________________")
-    add_paragraph(doc, "Date: ______________________________")
-
-    out_path = f"Generated_Agreement_{timestamp_suffix()}.docx"
-    doc.save(out_path)
-    return out_path
+        chunksize = max(1, len(jobs) // (workers * 4))
+        from concurrent.futures import ProcessPoolExecutor
+        warm_up(backend)  # before the fork, so workers inherit it
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(batch_job, jobs, chunksize=chunksize))
+    if ARCHIVE_PATH:
+        # Workers skip the archive; one transaction here instead of one per document.
+        import archive
+        archive.record_many([(record, out_path, backend)
+                             for (_, record, *_), (_, out_path, error) in zip(jobs, results) if not error])
+    elapsed = time.perf_counter() - start
+
+    failures = [(row_number, error) for row_number, _, error in results if error]
+    done = len(results) - len(failures)
+    rate = done / elapsed if elapsed else 0.0
+    print(f"Generated {done}/{len(results)} agreements in {elapsed:.2f}s "
+          f"({rate:.1f} docs/sec, {workers} worker{'s' if workers != 1 else ''}) -> {out_dir}")
+    for row_number, error in failures:
+        print(f"  row {row_number}: {error}")
+    if size_report:
+        print_batch_sizes(results)
+    return failures
+
+def print_batch_sizes(results):
+    """One line per generated file: total size and the compressed word/document.xml."""
+    import docx_package
+    sizes = []
+    for row_number, out_path, error in results:
+        if error:
+            continue
+        parts = {name: packed for name, _, packed in docx_package.size_report(out_path)}
+        sizes.append(os.path.getsize(out_path))
+        print(f"  row {row_number}: {sizes[-1]:,} bytes (document.xml {parts['word/document.xml']:,}) "
+              f"{os.path.basename(out_path)}")
+    if sizes:
+        print(f"Sizes: {sum(sizes):,} bytes total, {sum(sizes) // len(sizes):,} bytes/doc average")
 
 # ---------------------------- Main ----------------------------
 
-def main():
-    print("=== Powell CM Solutions - Contract Generator (Enhanced v2) ===")
-    # Defaults
-    defaults = {
-        "firm_name": "Powell CM Solutions, LLC",
-        "venue_county": "Cook County",
-        "venue_state": "Illinois",
-        "venue_city": "Chicago",
-        "net_days": 30,
-        "termination_notice_days": 15,
-        "lol_multiplier": 2,
-        "annual_increase_cap": 4,
-        "ip_assignment": "License",  # or "Assignment"
-        "include_nda": True,
-        "include_dei": True,
-        "ai_required": True,  # Additional Insured language
-        "rates": {
-            "Principal / Executive": 250.00,
-            "Senior Project Manager": 200.00,
-            "Project Manager": 175.00,
-            "Project Engineer": 150.00,
-            "Coordinator / Admin": 100.00
-        }
-    }
+def positive_int(text):
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive whole number, got {text!r}")
+    return value
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a Master Services Agreement + Work Order (.docx).")
+    parser.add_argument("--batch", metavar="FILE", help="generate one agreement per row of a .csv or .jsonl file")
+    parser.add_argument("--out", default=".", help="output directory for --batch (default: current directory)")
+    parser.add_argument("--workers", type=positive_int, default=None,
+                        help="worker processes for --batch (default: CPU count)")
+    parser.add_argument("--backend", choices=BACKENDS, default="docx",
+                        help="docx (python-docx) or xml (direct WordprocessingML, faster); default: docx")
+    parser.add_argument("--zip-level", type=int, choices=range(10), default=None, metavar="0-9",
+                        help="zip deflate level (default: $AGREEMENT_ZIP_LEVEL or 6)")
+    parser.add_argument("--size-report", action="store_true", help="print the size of each generated document")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report import, warm-up and first-document times (python -X importtime) and exit")
+    args = parser.parse_args(argv)
+    if args.profile_startup:
+        import startup
+        print(startup.format_report(*startup.profile(startup.generator_phases(args.backend))))
+        return 0
+    if args.batch:
+        failed = run_batch(args.batch, args.out, args.workers, args.backend, args.zip_level, args.size_report)
+        return 1 if failed else 0
 
+    print("=== Powell CM Solutions - Contract Generator (Enhanced v2) ===")
+    # Load python-docx and the template while the user answers the prompts.
+    threading.Thread(target=warm_up, args=(args.backend,), daemon=True).start()
     # Parties & basics
     effective_date = prompt_text("Effective Date (e.g., August 29, 2025)", "")
     client_name = prompt_text("Client Legal Name", "")
-    firm_name = prompt_text("Your Firm Legal Name", defaults["firm_name"])
+    firm_name = prompt_text("Your Firm Legal Name", DEFAULTS["firm_name"])
     project_name = prompt_text("Project Name", "")
     term = prompt_text("Term (e.g., Sept 1, 2025 – June 30, 2026)", "")
 
-    role = menu_choice("Select Role:", [
-        "Owner’s Representative",
-        "Program Manager",
-        "Construction Manager (Advisor)",
-        "Developer Advisory",
-        "Subconsultant"
-    ], default_idx=1)
+    role = menu_choice("Select Role:", CHOICES["role"], default_idx=1)
 
-    relationship = menu_choice("Select Relationship:", [
-        "Prime",
-        "Subconsultant"
-    ], default_idx=0)
+    relationship = menu_choice("Select Relationship:", CHOICES["relationship"], default_idx=0)
 
     prime_reference = ""
     if relationship == "Subconsultant":
         prime_reference = prompt_text("Prime Contract Reference / Project Flow-down Identifier", "[Attach Reference]")
 
-    compensation = menu_choice("Compensation Method:", [
-        "Hourly",
-        "Lump Sum",
-        "Hybrid"
-    ], default_idx=0)
+    compensation = menu_choice("Compensation Method:", CHOICES["compensation"], default_idx=0)
 
     nte = lump_sum = monthly_cap = 0.0
     if compensation == "Hourly":
@@ -323,30 +566,24 @@ def main():
     else:
         monthly_cap = prompt_money("If Hybrid, monthly cap (number only)", "0")
 
-    insurance = menu_choice("Insurance Tier:", [
-        "Standard",
-        "Expanded",
-        "Reduced"
-    ], default_idx=0)
+    insurance = menu_choice("Insurance Tier:", CHOICES["insurance"], default_idx=0)
 
-    dispute = menu_choice("Dispute Resolution:", [
-        "Litigation",
-        "Arbitration",
-        "Mediation-then-Court"
-    ], default_idx=0)
+    dispute = menu_choice("Dispute Resolution:", CHOICES["dispute"], default_idx=0)
 
-    venue_county = prompt_text("Venue County", defaults["venue_county"])
-    venue_state = prompt_text("Venue State", defaults["venue_state"])
-    venue_city = prompt_text("Venue City (for arbitration seat)", defaults["venue_city"])
+    venue_county = prompt_text("Venue County", DEFAULTS["venue_county"])
+    venue_state = prompt_text("Venue State", DEFAULTS["venue_state"])
+    venue_city = prompt_text("Venue City (for arbitration seat)", DEFAULTS["venue_city"])
 
     # Optional toggles
     print("\n--- Optional Clauses (Enter to keep default) ---")
-    net_days = int(prompt_text("Payment Terms - Net Days", str(defaults["net_days"])) or defaults["net_days"])
-    termination_notice_days = int(prompt_text("Termination Notice Days", str(defaults["termination_notice_days"])) or defaults["termination_notice_days"])
-    lol_multiplier = int(prompt_text("Limitation of Liability multiplier (x fees)", str(defaults["lol_multiplier"])) or defaults["lol_multiplier"])
-    annual_increase_cap = int(prompt_text("Annual Rate Increase Cap (%)", str(defaults["annual_increase_cap"])) or defaults["annual_increase_cap"])
-
-    ip_assignment = menu_choice("Deliverables ownership:", ["License", "Assignment"], default_idx=0)
+    net_days = prompt_number("Payment Terms - Net Days", DEFAULTS["net_days"], int)
+    termination_notice_days = prompt_number("Termination Notice Days", DEFAULTS["termination_notice_days"], int)
+    lol_multiplier = prompt_number("Limitation of Liability multiplier (x fees)", DEFAULTS["lol_multiplier"], int)
+    annual_increase_cap = prompt_number("Annual Rate Increase Cap (%)", DEFAULTS["annual_increase_cap"], int)
+    projection_years = prompt_number(f"Projected rate years in Exhibit E (0 = none, up to {MAX_PROJECTION_YEARS})",
+                                     DEFAULTS["projection_years"], int, LIMITS["projection_years"])
+
+    ip_assignment = menu_choice("Deliverables ownership:", CHOICES["ip_assignment"], default_idx=0)
     include_nda = menu_choice("Include short mutual NDA?", ["Yes", "No"], default_idx=0) == "Yes"
     include_dei = menu_choice("Include Inclusion/Non-Discrimination statement?", ["Yes", "No"], default_idx=0) == "Yes"
     ai_required = menu_choice("Include Additional Insured language?", ["Yes", "No"], default_idx=0) == "Yes"
@@ -354,19 +591,15 @@ def main():
     # Rate Card (edit inline)
     print("\nCurrent Rate Card (press Enter to keep):")
     rates = {}
-    for role_name, default_rate in defaults["rates"].items():
-        raw = prompt_text(f"Rate for {role_name}", f"{default_rate}")
-        try:
-            rates[role_name] = float(raw)
-        except:
-            rates[role_name] = default_rate
+    for role_name, default_rate in DEFAULTS["rates"].items():
+        rates[role_name] = prompt_number(f"Rate for {role_name}", default_rate)
 
     data = {
-        "effective_date": effective_date or "____ ______, 20__",
-        "client_name": client_name or "[Client Legal Name]",
-        "firm_name": firm_name or defaults["firm_name"],
-        "project_name": project_name or "[Project Name]",
-        "term": term or "[Start – End]",
+        "effective_date": effective_date or DEFAULTS["effective_date"],
+        "client_name": client_name or DEFAULTS["client_name"],
+        "firm_name": firm_name or DEFAULTS["firm_name"],
+        "project_name": project_name or DEFAULTS["project_name"],
+        "term": term or DEFAULTS["term"],
         "role": role,
         "relationship": relationship,
         "prime_reference": prime_reference,
@@ -383,6 +616,7 @@ def main():
         "termination_notice_days": termination_notice_days,
         "lol_multiplier": lol_multiplier,
         "annual_increase_cap": annual_increase_cap,
+        "projection_years": projection_years,
         "ip_assignment": ip_assignment,
         "include_nda": include_nda,
         "include_dei": include_dei,
@@ -390,8 +624,11 @@ def main():
         "rates": rates
     }
 
-    out = build_agreement(data)
+    out = build_agreement(data, backend=args.backend, level=args.zip_level)
     print(f"\nDone! Created: {out}")
+    if args.size_report:
+        import docx_package
+        print(docx_package.format_size_report(docx_package.size_report(out), os.path.getsize(out)))
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Powell CM Solutions - Package Template
+--------------------------------------
+The .docx package every agreement starts from, and how it is written out.
+
+python-docx's default template carries ~160 styles (and a second copy of them
+in stylesWithEffects.xml), latent style tables, a thumbnail, custom XML, web
+settings and a numbering part, none of which the agreements use. template()
+builds a stripped copy once: the default template minus those parts, with
+only the styles the clause library can produce (plus whatever they are based
+on or linked to). Body text formatting lives in paragraph styles defined here
+once (BODY_STYLES) instead of being repeated on every run.
+
+Both backends deflate at ZIP_LEVEL (AGREEMENT_ZIP_LEVEL, 0-9, default 6),
+unless a level is passed explicitly. size_report() lists the parts of a
+generated file with their raw and compressed sizes.
+
+Usage:
+    doc = docx_package.new_document()
+    docx_package.save(doc, "Agreement.docx", level=9)
+    print(docx_package.format_size_report(docx_package.size_report("Agreement.docx")))
+"""
+
+import copy
+import io
+import os
+import zipfile
+from functools import lru_cache
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.pkgwriter import _ContentTypesItem
+from docx.oxml.ns import qn
+from docx.shared import Pt
+
+ZIP_LEVEL = int(os.environ.get("AGREEMENT_ZIP_LEVEL", "6"))
+
+BODY_FONT = "Calibri"
+BODY_SIZE = 11
+# Clause library paragraph size -> style name. Sizes without a style use the
+# BODY_SIZE style plus a direct run size (see contract_generator.add_paragraph).
+BODY_STYLES = {11: "Agreement Body", 12: "Agreement Body Large"}
+
+# Styles python-docx or the clause library refer to by name; the closure over
+# basedOn/next/link is kept as well.
+USED_STYLES = ("Normal", "Title", "DefaultParagraphFont", "TableNormal", "NoList") + tuple(
+    f"Heading{level}" for level in range(1, 10))
+
+STYLES_WITH_EFFECTS = "http://schemas.microsoft.com/office/2007/relationships/stylesWithEffects"
+UNUSED_PARTS = (STYLES_WITH_EFFECTS, RT.WEB_SETTINGS, RT.CUSTOM_XML, RT.NUMBERING, RT.THUMBNAIL)
+
+# ---------------------------- Template ----------------------------
+
+def add_body_styles(doc):
+    for size, name in BODY_STYLES.items():
+        style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = doc.styles['Normal']
+        style.font.name = BODY_FONT
+        style.font.size = Pt(size)
+
+def strip_styles(styles_element, keep):
+    by_id = {s.get(qn('w:styleId')): s for s in styles_element.iterchildren(qn('w:style'))}
+    pending, kept = list(keep), set()
+    while pending:
+        style_id = pending.pop()
+        if style_id in kept or style_id not in by_id:
+            continue
+        kept.add(style_id)
+        for ref in ('w:basedOn', 'w:next', 'w:link'):
+            child = by_id[style_id].find(qn(ref))
+            if child is not None:
+                pending.append(child.get(qn('w:val')))
+    for style_id, style in by_id.items():
+        if style_id not in kept:
+            styles_element.remove(style)
+    for element in list(styles_element.iterchildren(qn('w:latentStyles'))):
+        styles_element.remove(element)
+    for rsid in list(styles_element.iter(qn('w:rsid'))):
+        rsid.getparent().remove(rsid)
+
+def drop_parts(doc):
+    for rels in (doc.part.rels, doc.part.package.rels):
+        for r_id, rel in list(rels.items()):
+            if rel.reltype in UNUSED_PARTS:
+                del rels[r_id]
+
+@lru_cache(maxsize=None)
+def template():
+    """Bytes of the stripped package template."""
+    doc = Document()
+    add_body_styles(doc)
+    body_ids = [doc.styles[name].style_id for name in BODY_STYLES.values()]
+    strip_styles(doc.styles.element, USED_STYLES + tuple(body_ids))
+    settings = doc.settings.element
+    for rsids in list(settings.iterchildren(qn('w:rsids'))):
+        settings.remove(rsids)
+    drop_parts(doc)
+    buf = io.BytesIO()
+    save(doc, buf)
+    return buf.getvalue()
+
+def new_document():
+    return Document(io.BytesIO(template()))
+
+def copy_missing_styles(doc, source):
+    """Add the styles of `source` that `doc` lacks, e.g. before moving `source` content into `doc`."""
+    styles = doc.styles.element
+    present = {s.get(qn('w:styleId')) for s in styles.iterchildren(qn('w:style'))}
+    for style in source.styles.element.iterchildren(qn('w:style')):
+        if style.get(qn('w:styleId')) not in present:
+            styles.append(copy.deepcopy(style))
+
+# ---------------------------- Saving ----------------------------
+
+def save(doc, output_path, level=None):
+    """doc.save() at a chosen deflate level (python-docx always uses zlib's default).
+
+    `output_path` may be a path or a writable binary stream.
+    """
+    package = doc.part.package
+    parts = list(package.iter_parts())
+    for part in parts:
+        part.before_marshal()
+    level = ZIP_LEVEL if level is None else level
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=level) as zf:
+        zf.writestr(CONTENT_TYPES_URI.membername, _ContentTypesItem.from_parts(parts).blob)
+        zf.writestr(PACKAGE_URI.rels_uri.membername, package.rels.xml)
+        for part in parts:
+            zf.writestr(part.partname.membername, part.blob)
+            if len(part.rels):
+                zf.writestr(part.partname.rels_uri.membername, part.rels.xml)
+
+# ---------------------------- Size report ----------------------------
+
+def size_report(source):
+    """[(part name, raw bytes, compressed bytes)] for a .docx path, stream or bytes, largest first."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    elif hasattr(source, 'seek'):
+        source.seek(0)
+    with zipfile.ZipFile(source) as zf:
+        rows = [(info.filename, info.file_size, info.compress_size) for info in zf.infolist()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+def format_size_report(rows, total=None):
+    """Text table for size_report() rows; `total` is the file size (parts plus zip headers)."""
+    width = max([len(name) for name, _, _ in rows] + [4])
+    lines = [f"  {'part':<{width}}  {'raw':>9}  {'deflated':>9}"]
+    lines.extend(f"  {name:<{width}}  {raw:>9,}  {packed:>9,}" for name, raw, packed in rows)
+    raw_total = sum(raw for _, raw, _ in rows)
+    packed_total = sum(packed for _, _, packed in rows)
+    lines.append(f"  {'total':<{width}}  {raw_total:>9,}  {packed_total:>9,}")
+    if total is not None:
+        lines.append(f"  file size {total:,} bytes")
+    return "\n".join(lines)
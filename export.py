@@ -0,0 +1,198 @@
+"""
+Powell CM Solutions - ZIP Export
+--------------------------------
+Streams many agreements into one ZIP archive, generating each one as it is
+written.
+
+stream_zip() yields the archive in pieces: the local header and bytes of each
+.docx as soon as that document is built, and the central directory at the
+end. Only the document being written is held in memory, so an export of
+hundreds of agreements costs about as much memory as one, and the first bytes
+reach the client while the rest are still being generated. The .docx files
+are already deflated, so entries are stored uncompressed.
+
+Records that fail to render are skipped and listed in an errors.txt entry at
+the end of the archive (the response status has been sent by then).
+
+Usage:
+    for chunk in export.stream_agreements(records, where={"project_name": "Program X"}):
+        out.write(chunk)
+
+    python export.py deals.jsonl [--where project_name="Program X"] [-o agreements.zip] [--backend xml]
+    python export.py --archive --where client_name=Acme -o acme.zip
+"""
+
+import argparse
+import re
+import sys
+import zipfile
+
+import contract_generator
+
+# ---------------------------- Selection ----------------------------
+
+def matches(data, where):
+    """True if normalized `data` satisfies every key/value of `where`.
+
+    Text fields match case-insensitively as substrings; other fields (numbers,
+    toggles) must equal the value after the same coercion normalize_data applies.
+    """
+    for key, wanted in where.items():
+        value = data.get(key)
+        if isinstance(value, str):
+            if str(wanted).strip().lower() not in value.lower():
+                return False
+        elif value != coerce(key, wanted):
+            return False
+    return True
+
+def coerce(key, value):
+    """`value` converted the way normalize_data converts field `key`."""
+    default = contract_generator.DEFAULTS.get(key)
+    if isinstance(default, bool):
+        return contract_generator.to_bool(value)
+    if isinstance(default, (int, float)):
+        try:
+            return contract_generator.to_number(value, type(default))
+        except contract_generator.DataError:
+            return None
+    return value
+
+def normalize_where(where, aliases=None):
+    """`where` with its keys mapped through `aliases` (e.g. app.FORM_FIELDS) and checked.
+
+    Raises contract_generator.DataError for a key that is not a scalar build_agreement
+    field or a number field compared with something that is not a number, so a typo
+    cannot turn into an empty export.
+    """
+    if not isinstance(where, dict):
+        raise contract_generator.DataError("where: expected an object of field: value")
+    out = {}
+    for key, value in where.items():
+        field = (aliases or {}).get(key, key)
+        if not isinstance(contract_generator.DEFAULTS.get(field), (str, int, float)):
+            raise contract_generator.DataError(f"where: unknown field {key!r}")
+        if coerce(field, value) is None:
+            raise contract_generator.DataError(f"where: {key} expects a number, got {value!r}")
+        out[field] = value
+    return out
+
+def select_records(records, where=None):
+    """Yield (index, normalized data) for the records matching `where`; bad records yield the error."""
+    for index, record in enumerate(records, 1):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            data = contract_generator.normalize_data(record)
+        except Exception as e:
+            yield index, e
+            continue
+        if not where or matches(data, where):
+            yield index, data
+
+# ---------------------------- ZIP stream ----------------------------
+
+class ZipSink:
+    """Write-only target for zipfile: collects what was written until the generator drains it.
+
+    It has no tell()/seek(), so zipfile writes a streamable archive.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def stream_zip(entries):
+    """Yield the bytes of a ZIP archive of (name, blob) `entries`, one entry at a time."""
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as zf:
+        for name, blob in entries:
+            zf.writestr(name, blob)
+            yield sink.drain()
+    yield sink.drain()
+
+# ---------------------------- Agreements ----------------------------
+
+UNSAFE_RE = re.compile(r"[^\w.-]+")
+
+def entry_name(index, data):
+    parts = [f"{index:05d}", data['client_name'], data['project_name']]
+    return "_".join(UNSAFE_RE.sub("-", part).strip("-")[:40] or "x" for part in parts) + ".docx"
+
+def agreement_entries(selected, backend="docx"):
+    """(name, .docx bytes) for each selected record, rendered lazily; failures go to errors.txt."""
+    errors = []
+    for index, data in selected:
+        if isinstance(data, Exception):
+            errors.append(f"record {index}: {type(data).__name__}: {data}")
+            continue
+        try:
+            blob = contract_generator.build_agreement_bytes(data, backend=backend)
+        except Exception as e:
+            errors.append(f"record {index}: {type(e).__name__}: {e}")
+            continue
+        yield entry_name(index, data), blob
+    if errors:
+        yield "errors.txt", ("\n".join(errors) + "\n").encode('utf-8')
+
+def stream_agreements(records, where=None, backend="docx"):
+    """ZIP bytes of one agreement per record (matching `where`), generated while streaming."""
+    return stream_zip(agreement_entries(select_records(records, where), backend))
+
+# ---------------------------- Main ----------------------------
+
+def parse_where(pairs):
+    where = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"--where expects field=value with a build_agreement field, got {pair!r}")
+        where[key] = value
+    try:
+        return normalize_where(where)
+    except contract_generator.DataError as e:
+        raise SystemExit(f"--{e}") from None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate agreements from a .jsonl/.csv file straight into a ZIP.")
+    parser.add_argument("records", nargs="?", help=".jsonl or .csv file of agreement data (as for --batch)")
+    parser.add_argument("--archive", action="store_true",
+                        help="regenerate agreements recorded in the archive index instead of reading a file")
+    parser.add_argument("--where", action="append", default=[], metavar="FIELD=VALUE",
+                        help="only records whose FIELD contains (text) or equals (numbers, toggles) VALUE; repeatable")
+    parser.add_argument("-o", "--out", default="-", help="output .zip (default: stdout)")
+    parser.add_argument("--backend", choices=contract_generator.BACKENDS, default="docx")
+    args = parser.parse_args(argv)
+
+    if bool(args.records) == args.archive:
+        parser.error("give either a records file or --archive")
+    where = parse_where(args.where)
+    if args.archive:
+        import archive
+        records = archive.select_data(where)
+    else:
+        records = (record for _, record in contract_generator.read_records(args.records))
+    chunks = stream_agreements(records, where, args.backend)
+    if args.out == "-":
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.out, 'wb') as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Powell CM Solutions - Generation Jobs
+-------------------------------------
+Bounded background engine for rendering agreements.
+
+A JobEngine runs render functions on a fixed-size thread pool. At most
+`queue_depth` jobs may be queued or running at once; submitting beyond that
+raises QueueFull, which the web app turns into 429. Finished jobs keep their
+result for `result_ttl` seconds and are then dropped; beyond `max_results`
+finished jobs, the oldest are dropped early.
+
+Usage:
+    engine = JobEngine(workers=4, queue_depth=64, result_ttl=600, max_results=1000)
+    job = engine.submit(render_cache.get_or_render, data)
+    engine.get(job.id).status  # "queued" | "running" | "done" | "failed"
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class QueueFull(Exception):
+    """Raised by JobEngine.submit when queue_depth jobs are already pending."""
+
+class Job:
+    def __init__(self, fn, args):
+        self.id = uuid.uuid4().hex
+        self.context = contextvars.copy_context()  # carries the submitter's trace into the worker
+        self.fn = fn
+        self.args = args
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.keep = True  # counts toward JobEngine.max_results once finished
+        self.done = threading.Event()
+
+    def run(self):
+        self.context.run(self._run)
+
+    def _run(self):
+        self.status = "running"
+        try:
+            self.result = self.fn(*self.args)
+            self.status = "done"
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.status = "failed"
+        finally:
+            self.finished = time.time()
+            self.done.set()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+class JobEngine:
+    def __init__(self, workers=4, queue_depth=64, result_ttl=600, max_results=1000):
+        self.queue_depth = queue_depth
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agreement-job")
+        self._jobs = {}
+        self._finished = OrderedDict()  # job id -> finish time, oldest first
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        """Queue `fn(*args)` and return its Job, or raise QueueFull."""
+        return self._submit(Job(fn, args))
+
+    def _submit(self, job):
+        with self._lock:
+            self._expire()
+            if self._pending >= self.queue_depth:
+                raise QueueFull(f"{self._pending} jobs pending (queue depth {self.queue_depth})")
+            self._pending += 1
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job)
+        return job
+
+    def run(self, fn, *args, timeout=None):
+        """Submit `fn(*args)` and wait for it; returns the result or raises RuntimeError on failure."""
+        job = Job(fn, args)
+        job.keep = False  # nobody polls for synchronous jobs
+        self._submit(job)
+        if not job.done.wait(timeout):
+            raise TimeoutError(f"job {job.id} still {job.status} after {timeout}s")
+        if job.error:
+            raise RuntimeError(job.error)
+        return job.result
+
+    def get(self, job_id):
+        """The Job for `job_id`, or None if unknown or expired."""
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "jobs": len(self._jobs), "finished": len(self._finished),
+                    "queue_depth": self.queue_depth}
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, job):
+        try:
+            job.run()
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if job.keep:
+                    self._finished[job.id] = job.finished
+                    self._expire()
+                else:
+                    self._jobs.pop(job.id, None)
+
+    def _expire(self):
+        # Caller holds self._lock.
+        cutoff = time.time() - self.result_ttl
+        while self._finished:
+            job_id, finished = next(iter(self._finished.items()))
+            if finished >= cutoff and len(self._finished) <= self.max_results:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
@@ -0,0 +1,529 @@
+"""
+Powell CM Solutions - Load Test
+-------------------------------
+Concurrent form submissions against the web app, end to end.
+
+Payloads are built from the fields of templates/form.html: every select gets
+one of its options and text and number inputs get plausible values, so a
+renamed or added form field is picked up without touching this file. Each
+worker thread runs a weighted mix of scenarios until the duration is up:
+
+- form      POST / with a new payload (usually a render)
+- repeat    POST / with one of --distinct payloads (mostly render cache hits)
+- job       POST /jobs, poll the job, then download the document
+- download  GET the Content-Location of an earlier form response
+
+The target is the app in this process through the Flask test client (default),
+the app served on 127.0.0.1 by a local threaded server (--http), or an
+already running server (--url, with --pid to watch its memory). Reported:
+throughput, p50/p90/p99 latency, error rate and status codes, RSS and open
+file descriptor growth between the end of the warm-up and the end of the run,
+and files left behind in the temp directory, the working directory and any
+--watch directory. Results are printed as a table and written as JSON with
+--json; --compare prints the change against an earlier JSON result.
+
+Usage:
+    python loadtest.py [--concurrency 8] [--duration 30] [--mix form=6,repeat=2,job=1,download=1]
+    python loadtest.py --http --json after.json --compare before.json
+    python loadtest.py --url http://127.0.0.1:8000 --pid 4242
+"""
+
+import argparse
+import gc
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urlencode, urlsplit
+
+FORM_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "form.html")
+SCENARIOS = ("form", "repeat", "job", "download")
+DEFAULT_MIX = "form=6,repeat=2,job=1,download=1"
+JOB_POLL_SECONDS = 0.02
+JOB_TIMEOUT = 60.0
+ERROR_SAMPLES = 10
+
+# ---------------------------- Payloads ----------------------------
+
+class FormFields(HTMLParser):
+    """Collects the fields of form.html: name -> ("select", [options]) or (input type, None)."""
+
+    def __init__(self):
+        super().__init__()
+        self.fields = {}
+        self._select = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "input" and attrs.get("name"):
+            self.fields[attrs["name"]] = (attrs.get("type", "text"), None)
+        elif tag == "select" and attrs.get("name"):
+            self._select = attrs["name"]
+            self.fields[self._select] = ("select", [])
+        elif tag == "option" and self._select is not None:
+            self.fields[self._select][1].append(attrs.get("value", ""))
+
+    def handle_endtag(self, tag):
+        if tag == "select":
+            self._select = None
+
+def form_fields(path=FORM_PATH):
+    parser = FormFields()
+    with open(path, encoding='utf-8') as fh:
+        parser.feed(fh.read())
+    return parser.fields
+
+CLIENTS = ("Northfield Unified School District", "Cook County Health", "Lakeshore Transit Authority",
+           "Riverside Medical Center", "Summit Ridge Development LLC", "City of Evanston", "Prairie State University")
+PROJECTS = ("Central Campus Renovation", "Terminal B Expansion", "Main Street Streetscape", "Clinic Tower Fit-Out",
+            "Water Reclamation Upgrade", "Library Modernization", "Program X Phase 2")
+VENUES = (("Cook County", "Illinois", "Chicago"), ("Harris County", "Texas", "Houston"),
+          ("King County", "Washington", "Seattle"), ("Maricopa County", "Arizona", "Phoenix"))
+MONTHS = ("January", "March", "May", "July", "September", "November")
+TEXT_VALUES = {
+    "client_legal_name": lambda rng: rng.choice(CLIENTS),
+    "project_name": lambda rng: f"{rng.choice(PROJECTS)} {rng.randint(1, 999)}",
+    "effective_date": lambda rng: f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {rng.randint(2025, 2027)}",
+    "term": lambda rng: f"{rng.choice(MONTHS)} 1, 2026 – {rng.choice(MONTHS)} 30, {rng.randint(2027, 2029)}",
+}
+NUMBER_VALUES = {
+    "hourly_cap": lambda rng: str(rng.randrange(25_000, 2_000_000, 500)),
+    "payment_terms_days": lambda rng: str(rng.choice((15, 30, 30, 45, 60))),
+    "termination_notice_days": lambda rng: str(rng.choice((7, 15, 30))),
+    "liability_multiplier": lambda rng: str(rng.randint(1, 3)),
+    "annual_rate_increase_cap": lambda rng: str(rng.randint(3, 6)),
+    "projection_years": lambda rng: str(rng.choice((0, 0, 0, 3, 5))),
+}
+VENUE_FIELDS = ("venue_county", "venue_state", "venue_city")
+
+def make_payload(fields, rng):
+    """One form submission as the browser would send it (blank fields included)."""
+    venue = dict(zip(VENUE_FIELDS, rng.choice(VENUES)))
+    payload = {}
+    for name, (kind, options) in fields.items():
+        if kind == "select":
+            payload[name] = rng.choice(options)
+        elif name in venue:
+            payload[name] = venue[name]
+        elif name in TEXT_VALUES:
+            payload[name] = TEXT_VALUES[name](rng)
+        elif kind == "number":
+            payload[name] = NUMBER_VALUES[name](rng) if name in NUMBER_VALUES and rng.random() < 0.7 else ""
+        else:
+            payload[name] = rng.choice(("", f"Load test {name}"))
+    if payload.get("compensation_method", "Hourly") != "Hourly" and "hourly_cap" in payload:
+        payload["hourly_cap"] = ""  # hidden by the form unless Hourly
+    return payload
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, sep, weight = part.partition("=")
+        name = name.strip()
+        if not sep or name not in SCENARIOS:
+            raise SystemExit(f"--mix expects scenario=weight pairs from {SCENARIOS}, got {part!r}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise SystemExit(f"--mix weight for {name} must be a number, got {weight!r}") from None
+    if not any(weight > 0 for weight in mix.values()):
+        raise SystemExit("--mix needs at least one positive weight")
+    return mix
+
+# ---------------------------- Clients ----------------------------
+
+class InProcessClient:
+    """The app through the Flask test client, one per worker thread."""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, form=None):
+        resp = self.client.open(path, method=method, data=form)
+        try:
+            return resp.status_code, resp.data, resp.headers
+        finally:
+            resp.close()
+
+class HttpClient:
+    """A keep-alive HTTP connection to `base_url`, one per worker thread."""
+
+    def __init__(self, base_url, timeout=JOB_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self.conn = None
+
+    def request(self, method, path, form=None):
+        body = urlencode(form) if form is not None else None
+        headers = {"Content-Type": "application/x-www-form-urlencoded"} if form is not None else {}
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            resp = self.conn.getresponse()
+            return resp.status, resp.read(), resp.headers
+        except Exception:
+            self.conn.close()
+            self.conn = None
+            raise
+
+def serve_locally(flask_app):
+    """Serve `flask_app` on an ephemeral 127.0.0.1 port in a daemon thread; returns (base URL, server)."""
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no access log line per request
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+# ---------------------------- Scenarios ----------------------------
+
+class LoadError(Exception):
+    pass
+
+def expect_docx(status, body, what):
+    if status != 200:
+        raise LoadError(f"{what} returned {status}")
+    if not body.startswith(b"PK"):
+        raise LoadError(f"{what} returned 200 without a .docx body")
+
+class Worker:
+    def __init__(self, client, state, rng):
+        self.client, self.state, self.rng = client, state, rng
+        self.samples = []  # (scenario, seconds, status or None, error or None)
+
+    def run_scenario(self, scenario):
+        state = self.state
+        if scenario == "download":
+            with state.lock:
+                location = self.rng.choice(state.locations) if state.locations else None
+            if location is None:
+                scenario = "form"  # nothing rendered yet
+        start = time.perf_counter()
+        status = error = None
+        try:
+            if scenario == "form":
+                status = self.post_form(make_payload(state.fields, self.rng))
+            elif scenario == "repeat":
+                status = self.post_form(self.rng.choice(state.repeat_pool))
+            elif scenario == "job":
+                status = self.run_job(make_payload(state.fields, self.rng))
+            else:
+                status, body, _ = self.client.request("GET", location)
+                if status != 404:  # evicted from the render cache is not an error
+                    expect_docx(status, body, f"GET {location}")
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.samples.append((scenario, time.perf_counter() - start, status, error))
+
+    def post_form(self, payload):
+        status, body, headers = self.client.request("POST", "/", payload)
+        expect_docx(status, body, "POST /")
+        location = headers.get("Content-Location")
+        if location:
+            with self.state.lock:
+                if len(self.state.locations) < 1000:
+                    self.state.locations.append(location)
+        return status
+
+    def run_job(self, payload):
+        status, body, _ = self.client.request("POST", "/jobs", payload)
+        if status != 202:
+            raise LoadError(f"POST /jobs returned {status}")
+        job = json.loads(body)
+        deadline = time.perf_counter() + JOB_TIMEOUT
+        while job["status"] not in ("done", "failed"):
+            if time.perf_counter() > deadline:
+                raise LoadError(f"job {job['id']} still {job['status']} after {JOB_TIMEOUT:.0f}s")
+            time.sleep(JOB_POLL_SECONDS)
+            status, body, _ = self.client.request("GET", job["status_url"])
+            if status != 200:
+                raise LoadError(f"GET {job['status_url']} returned {status}")
+            job = json.loads(body)
+        if job["status"] == "failed":
+            raise LoadError(f"job failed: {job.get('error')}")
+        status, body, _ = self.client.request("GET", job["download_url"])
+        expect_docx(status, body, f"GET {job['download_url']}")
+        return status
+
+class RunState:
+    def __init__(self, fields, repeat_pool):
+        self.fields = fields
+        self.repeat_pool = repeat_pool
+        self.locations = []
+        self.lock = threading.Lock()
+
+# ---------------------------- Resources ----------------------------
+
+def rss_kb(pid=None):
+    """Resident set size of `pid` (default: this process) from /proc, or None where unavailable."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", encoding='ascii') as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def open_fds(pid=None):
+    try:
+        return len(os.listdir(f"/proc/{pid or 'self'}/fd"))
+    except OSError:
+        return None
+
+def snapshot(dirs):
+    """{directory: set of entry names} for the watched directories that exist."""
+    return {d: set(os.listdir(d)) for d in dirs if os.path.isdir(d)}
+
+def new_files(before, after):
+    return {d: sorted(after[d] - before.get(d, set())) for d in after if after[d] - before.get(d, set())}
+
+class RssSampler:
+    """Polls RSS in the background so the report has the peak as well as start and end."""
+
+    def __init__(self, pid=None, interval=0.25):
+        self.pid, self.interval = pid, interval
+        self.peak = rss_kb(pid)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = rss_kb(self.pid)
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+# ---------------------------- Run ----------------------------
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else None
+
+def latency_summary(seconds):
+    ordered = sorted(seconds)
+    ms = lambda value: None if value is None else 1000 * value
+    return {
+        "count": len(ordered),
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else None,
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p90_ms": ms(percentile(ordered, 0.90)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "max_ms": ms(ordered[-1] if ordered else None),
+    }
+
+def run_load(make_client, fields, concurrency=4, duration=10.0, mix=None, distinct=20, warmup=20,
+             seed=0, pid=None, watch=()):
+    """Run the load and return the result dict (see the module docstring for what it holds)."""
+    mix = mix or parse_mix(DEFAULT_MIX)
+    rng = random.Random(seed)
+    state = RunState(fields, [make_payload(fields, rng) for _ in range(max(1, distinct))])
+    scenarios = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in scenarios]
+    workers = [Worker(make_client(), state, random.Random(seed + i + 1)) for i in range(concurrency)]
+
+    # Warm-up: first renders, skeleton builds and the repeat pool's cache entries are not measured.
+    for i in range(warmup):
+        workers[0].run_scenario(scenarios[i % len(scenarios)])
+    workers[0].samples.clear()
+    gc.collect()
+    watch_dirs = list(dict.fromkeys([tempfile.gettempdir(), os.getcwd(), *watch]))
+    files_before = snapshot(watch_dirs)
+    rss_start, fds_start = rss_kb(pid), open_fds(pid)
+
+    deadline = time.perf_counter() + duration
+    def loop(worker):
+        while time.perf_counter() < deadline:
+            worker.run_scenario(worker.rng.choices(scenarios, weights)[0])
+
+    threads = [threading.Thread(target=loop, args=(worker,)) for worker in workers]
+    start = time.perf_counter()
+    with RssSampler(pid) as sampler:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    rss_end, fds_end = rss_kb(pid), open_fds(pid)
+    leaked = new_files(files_before, snapshot(watch_dirs))
+
+    samples = [sample for worker in workers for sample in worker.samples]
+    errors = [error for _, _, _, error in samples if error]
+    statuses = {}
+    for _, _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    by_scenario = {}
+    for name in scenarios:
+        subset = [sample for sample in samples if sample[0] == name]
+        summary = latency_summary([seconds for _, seconds, _, _ in subset])
+        summary["errors"] = sum(1 for sample in subset if sample[3])
+        by_scenario[name] = summary
+    growth = rss_end - rss_start if rss_end is not None and rss_start is not None else None
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(samples) if samples else 0.0,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "latency": latency_summary([seconds for _, seconds, _, _ in samples]),
+        "scenarios": by_scenario,
+        "statuses": statuses,
+        "error_samples": sorted(set(errors))[:ERROR_SAMPLES],
+        "memory": {
+            "rss_start_kb": rss_start,
+            "rss_end_kb": rss_end,
+            "rss_peak_kb": max((kb for kb in (sampler.peak, rss_end) if kb is not None), default=None),
+            "growth_kb": growth,
+            "growth_kb_per_1k_requests": 1000 * growth / len(samples) if growth is not None and samples else None,
+        },
+        "open_fds": {"start": fds_start, "end": fds_end,
+                     "growth": fds_end - fds_start if fds_end is not None and fds_start is not None else None},
+        "new_files": leaked,
+        "new_file_count": sum(len(names) for names in leaked.values()),
+    }
+
+# ---------------------------- Report ----------------------------
+
+def fmt(value, spec=".1f"):
+    return "-" if value is None else format(value, spec)
+
+def print_table(result):
+    lat = result["latency"]
+    print(f"{result['requests']} requests in {result['elapsed_s']:.1f}s: {result['throughput_rps']:.1f} req/s, "
+          f"{result['errors']} errors ({100 * result['error_rate']:.2f}%)")
+    print(f"{'scenario':<10} {'count':>7} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, s in list(result["scenarios"].items()) + [("all", dict(lat, errors=result["errors"]))]:
+        print(f"{name:<10} {s['count']:>7} {s['errors']:>7} {fmt(s['p50_ms']):>8} {fmt(s['p90_ms']):>8} "
+              f"{fmt(s['p99_ms']):>8} {fmt(s['max_ms']):>8}")
+    print("status codes: " + ", ".join(f"{code} x{n}" for code, n in sorted(result["statuses"].items())))
+    mem, fds = result["memory"], result["open_fds"]
+    print(f"RSS: {fmt(mem['rss_start_kb'], ',')} KB -> {fmt(mem['rss_end_kb'], ',')} KB "
+          f"(peak {fmt(mem['rss_peak_kb'], ',')} KB, growth {fmt(mem['growth_kb'], ',')} KB, "
+          f"{fmt(mem['growth_kb_per_1k_requests'])} KB per 1k requests)")
+    print(f"open fds: {fmt(fds['start'], 'd')} -> {fmt(fds['end'], 'd')}; new files left behind: "
+          f"{result['new_file_count']}")
+    for directory, names in result["new_files"].items():
+        shown = ", ".join(names[:5]) + (f", ... ({len(names)} total)" if len(names) > 5 else "")
+        print(f"  {directory}: {shown}")
+    for error in result["error_samples"]:
+        print(f"  error: {error}")
+
+# (label, path into the result, higher is better)
+COMPARED = (
+    ("throughput req/s", ("throughput_rps",), True),
+    ("p50 ms", ("latency", "p50_ms"), False),
+    ("p99 ms", ("latency", "p99_ms"), False),
+    ("error rate %", ("error_rate",), False),
+    ("RSS growth KB", ("memory", "growth_kb"), False),
+    ("open fd growth", ("open_fds", "growth"), False),
+    ("new files", ("new_file_count",), False),
+)
+
+def lookup(result, path):
+    for key in path:
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+def print_comparison(before, after, label):
+    print(f"Against {label}:")
+    print(f"  {'metric':<18} {'before':>10} {'after':>10} {'change':>8}")
+    for name, path, higher_is_better in COMPARED:
+        old, new = lookup(before, path), lookup(after, path)
+        if path == ("error_rate",):
+            old, new = (None if v is None else 100 * v for v in (old, new))
+        change = f"{100 * (new / old - 1):+.0f}%" if old and new is not None else "-"
+        worse = old is not None and new is not None and (new < old if higher_is_better else new > old)
+        print(f"  {name:<18} {fmt(old, '.2f'):>10} {fmt(new, '.2f'):>10} {change:>8}" + ("  worse" if worse else ""))
+
+# ---------------------------- Main ----------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the agreement web app with concurrent form submissions.")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent clients (default: 4)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of measured load (default: 10)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--distinct", type=int, default=20, help="payloads the repeat scenario cycles through")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before the run (default: 20)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for payloads and the mix")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--http", action="store_true", help="serve the app on 127.0.0.1 and load it over HTTP")
+    target.add_argument("--url", help="load an already running server, e.g. http://127.0.0.1:5050")
+    parser.add_argument("--pid", type=int, help="with --url: server process whose RSS and fds to watch")
+    parser.add_argument("--watch", action="append", default=[], metavar="DIR",
+                        help="also report files left behind in DIR (e.g. the server's working directory)")
+    parser.add_argument("--json", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="print the change against an earlier --json result")
+    args = parser.parse_args(argv)
+    if args.concurrency < 1 or args.duration <= 0:
+        parser.error("--concurrency and --duration must be positive")
+    if args.pid and not args.url:
+        parser.error("--pid only applies with --url")
+
+    fields = form_fields()
+    server = None
+    if args.url:
+        target_name = args.url
+        make_client = lambda: HttpClient(args.url)
+    else:
+        import app
+        if args.http:
+            target_name, server = serve_locally(app.app)
+            make_client = lambda: HttpClient(target_name)
+        else:
+            target_name = "in-process"
+            make_client = lambda: InProcessClient(app.app)
+    # Against another server only its own process (--pid) is worth measuring.
+    pid = args.pid if args.url else None
+    try:
+        result = run_load(make_client, fields, args.concurrency, args.duration, parse_mix(args.mix),
+                          args.distinct, args.warmup, args.seed, pid, args.watch)
+    finally:
+        if server is not None:
+            server.shutdown()
+    if args.url and not args.pid:
+        result["memory"] = dict.fromkeys(result["memory"])
+        result["open_fds"] = dict.fromkeys(result["open_fds"])
+
+    print(f"Target {target_name}, {args.concurrency} clients, {args.duration:g}s, mix {args.mix}")
+    print_table(result)
+    output = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": target_name,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "mix": parse_mix(args.mix),
+            "distinct": args.distinct,
+            "seed": args.seed,
+            "backend": os.environ.get("RENDER_BACKEND", "docx"),
+        },
+        "result": result,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(output, fh, indent=2)
+        print(f"Results written to {args.json}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            print_comparison(json.load(fh)["result"], result, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
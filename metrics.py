@@ -0,0 +1,199 @@
+"""
+Powell CM Solutions - Metrics
+-----------------------------
+Opt-in instrumentation for agreement generation.
+
+Set AGREEMENT_METRICS=1 (or call enable()) to record:
+- agreement_section_seconds     time per build step and per write_body section
+- agreements_generated_total    documents rendered, by backend and option combination
+- agreement_output_bytes        size of each rendered .docx
+- http_request_duration_seconds Flask request latency, by endpoint/method/status
+
+render() returns them in Prometheus text format (served at /metrics by app.py),
+and the app writes one JSON trace line per request to the "agreements.trace"
+logger. When disabled, span() and laps() return a shared no-op object, so
+the instrumented code pays one function call and a flag check.
+
+Usage:
+    with metrics.span("save"):
+        doc.save(path)
+"""
+
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("AGREEMENT_METRICS", "").strip().lower() in ("1", "true", "yes", "on")
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BYTES_BUCKETS = (16384, 32768, 49152, 65536, 98304, 131072, 262144, 524288, 1048576)
+
+trace_log = logging.getLogger("agreements.trace")
+
+# Spans of the request (or job) being traced; None when nothing is tracing.
+current_trace = contextvars.ContextVar("agreement_trace", default=None)
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+    if on and not trace_log.handlers:
+        trace_log.addHandler(logging.StreamHandler())
+        trace_log.setLevel(logging.INFO)
+        trace_log.propagate = False
+
+# ---------------------------- Registry ----------------------------
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self.series.get(labels)
+            if row is None:
+                row = self.series[labels] = [0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, row in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), row):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(labels)} {row[-1]}")
+                lines.append(f"{self.name}_count{format_labels(labels)} {cumulative}")
+        return lines
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+section_seconds = Histogram("agreement_section_seconds", "Time spent per generation section.", SECONDS_BUCKETS)
+documents_total = Counter("agreements_generated_total", "Agreements rendered, by backend and option combination.")
+output_bytes = Histogram("agreement_output_bytes", "Size of rendered .docx files.", BYTES_BUCKETS)
+request_seconds = Histogram("http_request_duration_seconds", "Flask request latency.", SECONDS_BUCKETS)
+REGISTRY = (section_seconds, documents_total, output_bytes, request_seconds)
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# ---------------------------- Spans ----------------------------
+
+def observe_section(name, seconds):
+    section_seconds.observe(seconds, (("section", name),))
+    trace = current_trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+class Noop:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def lap(self, name):
+        pass
+
+    def close(self):
+        pass
+
+NOOP = Noop()
+
+class Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        observe_section(self.name, time.perf_counter() - self.start)
+        return False
+
+class Laps:
+    """Times consecutive sections of straight-line code: each lap() ends the previous one."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.name = None
+        self.start = 0.0
+
+    def lap(self, name):
+        now = time.perf_counter()
+        if self.name is not None:
+            observe_section(self.prefix + self.name, now - self.start)
+        self.name = name
+        self.start = now
+
+    def close(self):
+        self.lap(None)
+
+def span(name):
+    return Span(name) if ENABLED else NOOP
+
+def laps(prefix=""):
+    return Laps(prefix) if ENABLED else NOOP
+
+# ---------------------------- Documents and requests ----------------------------
+
+def record_document(backend, key, size):
+    names = ("role", "compensation", "insurance", "dispute", "ip_assignment", "nda", "dei", "ai", "projection")
+    values = ("default" if value is None else value for value in key)
+    documents_total.inc((("backend", backend),) + tuple(zip(names, values)))
+    if size is not None:
+        output_bytes.observe(size, (("backend", backend),))
+
+def record_request(endpoint, method, status, seconds, spans):
+    request_seconds.observe(seconds, (("endpoint", endpoint), ("method", method), ("status", status)))
+    trace_log.info(json.dumps({
+        "endpoint": endpoint,
+        "method": method,
+        "status": status,
+        "ms": round(1000 * seconds, 3),
+        "spans": [[name, round(1000 * s, 3)] for name, s in spans],
+    }))
+
+if ENABLED:
+    enable()
@@ -0,0 +1,151 @@
+"""
+Powell CM Solutions - Performance Suite
+---------------------------------------
+Repeatable performance gate for build_agreement and the web form.
+
+Cases:
+- option_matrix   build_agreement for every option combination (see benchmark.py)
+- rate_card_<n>   build_agreement with an n-row rate card (5 to 500 rows)
+- flask_home      POST / through the Flask test client, render cache disabled
+
+Each case reports wall time, p50/p95 latency, peak traced memory of a single
+render (tracemalloc, measured in a separate pass so it does not skew timings;
+it sees Python allocations, not lxml's C heap) and the mean .docx size. Apart
+from option_matrix, which is deliberately cold, every input is rendered once
+untimed first. Results can be saved as a JSON baseline; --compare fails (exit
+status 1) when any metric is worse than the baseline by more than --threshold.
+
+Usage:
+    python perf_suite.py --save perf_baseline.json
+    python perf_suite.py --compare perf_baseline.json [--threshold 0.25]
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import contract_generator
+from benchmark import option_records, summarize
+
+RATE_CARD_SIZES = (5, 50, 500)
+# Metrics compared against the baseline; lower is better for all of them.
+GATED_METRICS = ("p50_ms", "p95_ms", "peak_kb", "docx_bytes")
+
+def rate_card_record(rows):
+    rates = {f"Role {i:03d} – Region {i % 7}": 100.0 + i for i in range(rows)}
+    return contract_generator.normalize_data({"rates": rates})
+
+def form_post(client, form):
+    resp = client.post('/', data=form)
+    if resp.status_code != 200:
+        raise RuntimeError(f"POST / returned {resp.status_code}")
+    return resp.data
+
+def peak_kb(fn):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def run_case(render, inputs, repeats, mem_samples, warmup=True):
+    """Time `render(input) -> bytes` over `inputs`; returns a summary dict."""
+    timings, sizes = [], []
+    start = time.perf_counter()
+    for item in inputs:
+        if warmup:
+            render(item)
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            blob = render(item)
+            timings.append(time.perf_counter() - t0)
+        sizes.append(len(blob))
+    wall = time.perf_counter() - start
+    step = max(1, len(inputs) // mem_samples)
+    peak = max(peak_kb(lambda: render(item)) for item in inputs[::step])
+    summary = summarize(timings)
+    summary.update(wall_s=wall, peak_kb=peak, docx_bytes=sum(sizes) / len(sizes))
+    return summary
+
+def run_suite(backend="docx", stride=1, repeats=3, mem_samples=8):
+    build = lambda data: contract_generator.build_agreement_bytes(data, backend=backend)
+    cases = {}
+    # One render per combination: mostly skeleton/plan building, as in production.
+    cases["option_matrix"] = run_case(build, list(option_records())[::stride], 1, mem_samples, warmup=False)
+    for rows in RATE_CARD_SIZES:
+        cases[f"rate_card_{rows}"] = run_case(build, [rate_card_record(rows)], repeats * 10, 1)
+
+    import app
+    from render_cache import RenderCache
+    app.render_cache = RenderCache(max_bytes=0, version="perf", backend=backend)  # render every request
+    client = app.app.test_client()
+    form = {"client_legal_name": "Perf Client LLC", "project_name": "Perf Tower", "compensation_method": "Hourly",
+            "hourly_cap": "250000", "insurance_tier": "Standard", "dispute_resolution": "Arbitration"}
+    cases["flask_home"] = run_case(lambda f: form_post(client, f), [form], repeats * 10, 1)
+    return cases
+
+def compare(baseline, current, threshold):
+    """Return a list of (case, metric, baseline, current) regressions beyond `threshold`."""
+    regressions = []
+    for case, metrics in current.items():
+        base = baseline.get(case)
+        if base is None:
+            continue
+        for metric in GATED_METRICS:
+            if base.get(metric) and metrics[metric] > base[metric] * (1 + threshold):
+                regressions.append((case, metric, base[metric], metrics[metric]))
+    return regressions
+
+def print_table(cases):
+    print(f"{'case':<16} {'wall s':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak KB':>9} {'docx KB':>8}")
+    for case, m in cases.items():
+        print(f"{case:<16} {m['wall_s']:8.2f} {m['p50_ms']:8.2f} {m['p95_ms']:8.2f} "
+              f"{m['peak_kb']:9.0f} {m['docx_bytes'] / 1024:8.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark and memory-profile agreement generation.")
+    parser.add_argument("--backend", choices=contract_generator.BACKENDS, default="docx")
+    parser.add_argument("--stride", type=int, default=1, help="time every Nth option combination (default: 1, all)")
+    parser.add_argument("--repeats", type=int, default=3, help="timed renders per case are 10x this (default: 3)")
+    parser.add_argument("--save", metavar="FILE", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="fail if results regress against this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative regression per metric for --compare (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    cases = run_suite(args.backend, args.stride, args.repeats)
+    print_table(cases)
+    result = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "stride": args.stride,
+            "repeats": args.repeats,
+        },
+        "cases": cases,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as fh:
+            json.dump(result, fh, indent=2)
+        print(f"Baseline written to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        regressions = compare(baseline["cases"], cases, args.threshold)
+        for case, metric, base, now in regressions:
+            print(f"  REGRESSION {case}.{metric}: {base:.2f} -> {now:.2f} (+{100 * (now / base - 1):.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {100 * args.threshold:.0f}% against {args.compare}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Powell CM Solutions - Rate Schedule Tables
+------------------------------------------
+Bulk builders for the Exhibit E tables.
+
+python-docx adds table rows one proxy at a time (add_row, then cell.text per
+cell), which dominates render time for rate schedules with hundreds of roles.
+Here whole rows are written as WordprocessingML strings in one pass and parsed
+once; the markup matches what python-docx writes for the same text, so the
+output is unchanged. wordml.py uses the same row builder.
+
+Projected rates apply the annual increase cap to every rate and year at once,
+with NumPy when it is installed and plain Python otherwise.
+
+Usage:
+    append_rows(table, rate_rows(data['rates']))
+    projection_rows(data['rates'], data['annual_increase_cap'], years=5)
+"""
+
+from xml.sax.saxutils import escape
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+try:
+    import numpy
+except ImportError:  # optional: projections fall back to plain Python
+    numpy = None
+
+# ---------------------------- Rows ----------------------------
+
+def run_xml(text):
+    """<w:r> content for `text`, written the way python-docx's run.text setter does."""
+    parts = []
+    pending = []
+
+    def flush():
+        if pending:
+            chunk = "".join(pending)
+            space = ' xml:space="preserve"' if chunk.strip() != chunk else ''
+            parts.append(f"<w:t{space}>{escape(chunk)}</w:t>")
+            pending.clear()
+
+    for ch in text:
+        if ch == "\t":
+            flush()
+            parts.append("<w:tab/>")
+        elif ch in "\r\n":
+            flush()
+            parts.append("<w:br/>")
+        else:
+            pending.append(ch)
+    flush()
+    return "<w:r/>" if not parts else "<w:r>" + "".join(parts) + "</w:r>"
+
+def row_xml(texts, widths):
+    cells = "".join(
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr><w:p>{run_xml(text)}</w:p></w:tc>'
+        for text, width in zip(texts, widths)
+    )
+    return f"<w:tr>{cells}</w:tr>"
+
+def rows_xml(rows, widths):
+    return "".join(row_xml(texts, widths) for texts in rows)
+
+def table_widths(table):
+    return [col.get(qn('w:w')) for col in table._tbl.tblGrid.iterchildren(qn('w:gridCol'))]
+
+def append_rows(table, rows):
+    """Append text rows to a python-docx table with a single parse."""
+    xml = rows_xml(rows, table_widths(table))
+    if xml:
+        wrapper = parse_xml(f"<w:tbl {nsdecls('w')}>{xml}</w:tbl>")
+        table._tbl.extend(list(wrapper))
+    return table
+
+def table_xml(header, rows, width):
+    """A complete <w:tbl> as python-docx's add_table would write it, `width` twips per column."""
+    widths = [width] * len(header)
+    grid = "".join(f'<w:gridCol w:w="{w}"/>' for w in widths)
+    return (
+        '<w:tbl><w:tblPr><w:tblW w:type="auto" w:w="0"/><w:tblLook w:firstColumn="1" w:firstRow="1" '
+        'w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+        f"<w:tblGrid>{grid}</w:tblGrid>{row_xml(header, widths)}{rows_xml(rows, widths)}</w:tbl>"
+    )
+
+# ---------------------------- Rates ----------------------------
+
+def money(value):
+    return f"${value:,.2f}"
+
+def rate_rows(rates, clean=str):
+    return [(clean(role), money(float(rate))) for role, rate in rates.items()]
+
+def project_rates(values, cap_pct, years):
+    """values x years matrix: year 1 is the current rate, each later year grows by cap_pct."""
+    if numpy is not None:
+        factors = (1 + float(cap_pct) / 100) ** numpy.arange(years)
+        return numpy.outer(numpy.asarray(values, dtype=float), factors).tolist()
+    factors = [(1 + float(cap_pct) / 100) ** year for year in range(years)]
+    return [[value * factor for factor in factors] for value in values]
+
+def projection_header(years):
+    return ["Role"] + [f"Year {year}" for year in range(1, years + 1)]
+
+def projection_rows(rates, cap_pct, years, clean=str):
+    matrix = project_rates([float(rate) for rate in rates.values()], cap_pct, years)
+    return [[clean(role)] + [money(value) for value in row] for role, row in zip(rates, matrix)]
@@ -0,0 +1,201 @@
+"""
+Powell CM Solutions - Render Cache
+----------------------------------
+Content-addressed cache of finished agreements (.docx bytes).
+
+The key is a SHA-256 over the canonical JSON of the normalized `data` dict
+(plus digests of the backend name, the zip level, the source of every module
+that renders (SOURCE_FILES) and the clause library text, so a code or clause
+change never serves stale documents). Entries live in a bounded in-memory LRU and,
+optionally, in an on-disk directory that is trimmed oldest-first once it
+exceeds its size cap.
+
+Usage:
+    cache = RenderCache(disk_dir="cache/")
+    key, blob = cache.get_or_render(data)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import clauses
+import contract_generator
+import docx_package
+import rate_schedule
+
+# Modules whose source decides the rendered bytes.
+SOURCE_FILES = (
+    contract_generator.__file__,
+    os.path.join(os.path.dirname(os.path.abspath(contract_generator.__file__)), "wordml.py"),
+    docx_package.__file__,
+    rate_schedule.__file__,
+    clauses.__file__,
+)
+
+def source_digest(backend="docx"):
+    digest = hashlib.sha256(f"{backend}\n{docx_package.ZIP_LEVEL}".encode('utf-8'))
+    for path in SOURCE_FILES:
+        with open(path, 'rb') as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()[:12]
+
+class RenderCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=1024 * 1024 * 1024, version=None,
+                 backend="docx"):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.backend = backend
+        self.version = version if version is not None else source_digest(backend)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = self.disk_evictions = 0
+        self._disk_size = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_size = sum(size for _, size, _ in self._disk_files())
+
+    def key_for(self, data):
+        """Hex digest identifying the document `data` renders to (usable as an HTTP ETag)."""
+        canonical = json.dumps(contract_generator.normalize_data(data), sort_keys=True,
+                               separators=(',', ':'), ensure_ascii=False)
+        # The clause library hot-reloads, so its digest is part of every key.
+        clause_digest = clauses.current().digest
+        return hashlib.sha256(f"{self.version}\n{clause_digest}\n{canonical}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return blob
+        blob = self._disk_get(key)
+        with self._lock:
+            if blob is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, blob)
+        return blob
+
+    def put(self, key, blob):
+        with self._lock:
+            self._remember(key, blob)
+        self._disk_put(key, blob)
+
+    def get_or_render(self, data):
+        """Return (key, docx bytes) for `data`, rendering and caching it on a miss."""
+        data = contract_generator.normalize_data(data)
+        key = self.key_for(data)
+        blob = self.get(key)
+        if blob is None:
+            blob = contract_generator.build_agreement_bytes(data, backend=self.backend)
+            self.put(key, blob)
+        return key, blob
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    # ---------------------------- Memory tier ----------------------------
+
+    def _remember(self, key, blob):
+        # Caller holds self._lock.
+        if len(blob) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = blob
+        self._size += len(blob)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    # ---------------------------- Disk tier ----------------------------
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.docx")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as fh:
+                blob = fh.read()
+            os.utime(path)  # mark as recently used for eviction
+            return blob
+        except OSError:
+            return None
+
+    def _disk_put(self, key, blob):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(blob)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._disk_size += len(blob) - replaced
+            over = self._disk_size > self.disk_max_bytes
+        if over:
+            self._disk_trim()
+
+    def _disk_files(self):
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.docx'):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, entry.path))
+        return files
+
+    def _disk_trim(self):
+        # Only called once the running total passes the cap. Trimming to 90% of it
+        # means the directory is scanned once per batch of evictions, not per put.
+        files = self._disk_files()
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * 9 // 10
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_size = total
+            self.disk_evictions += evicted
@@ -0,0 +1,92 @@
+"""
+Powell CM Solutions - Startup Profile
+-------------------------------------
+Where the time goes between starting a process and its first agreement.
+
+profile() runs a list of (phase, code) steps in a fresh interpreter started
+with `python -X importtime`, times each step, and totals the import times the
+interpreter reports by top-level package. The report shows what the first
+document waits for and which imports are worth deferring.
+
+Usage:
+    python contract_generator.py --profile-startup [--backend xml]
+    python app.py --profile-startup
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in the child: executes the phases in one namespace, prints their timings as the last line.
+RUNNER = """
+import json, sys, time
+timings, env = [], {}
+for name, code in json.loads(sys.argv[1]):
+    start = time.perf_counter()
+    exec(code, env)
+    timings.append((name, time.perf_counter() - start))
+print(json.dumps(timings))
+"""
+
+def generator_phases(backend="docx"):
+    data = "contract_generator.normalize_data({})"
+    return [
+        ("import", "import contract_generator"),
+        ("warm_up", f"contract_generator.warm_up({backend!r})"),
+        ("first document", f"contract_generator.build_agreement_bytes({data}, backend={backend!r})"),
+        ("second document", f"contract_generator.build_agreement_bytes({data}, backend={backend!r})"),
+    ]
+
+def app_phases():
+    # app.warm_up runs at import unless APP_WARM_UP=0; it is timed as its own phase here.
+    return [
+        ("import", "import os; os.environ['APP_WARM_UP'] = '0'; import app"),
+        ("warm_up", "app.warm_up()"),
+        ("first request", "app.app.test_client().post('/', data={}).close()"),
+        ("second request", "app.app.test_client().post('/', data={'project_name': 'Second'}).close()"),
+    ]
+
+def parse_importtime(stderr):
+    """{top-level package: (self seconds, modules)} from `-X importtime` output."""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        package = fields[2].strip().split(".")[0]
+        seconds, modules = packages.get(package, (0.0, 0))
+        packages[package] = (seconds + int(fields[0]) / 1e6, modules + 1)
+    return packages
+
+def profile(phases):
+    """(phase timings, import totals by package, process wall time) for `phases` run in a new interpreter."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [HERE, os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", RUNNER, json.dumps(phases)],
+                          cwd=HERE, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(f"startup profile failed:\n{proc.stderr[-2000:]}")
+    timings = json.loads(proc.stdout.splitlines()[-1])
+    return timings, parse_importtime(proc.stderr), wall
+
+def format_report(timings, packages, wall, top=12):
+    lines = ["Startup profile (python -X importtime)", f"  {'phase':<18} {'ms':>8} {'since start':>12}"]
+    elapsed = 0.0
+    for name, seconds in timings:
+        elapsed += seconds
+        lines.append(f"  {name:<18} {seconds * 1000:>8.1f} {elapsed * 1000:>12.1f}")
+    lines.append(f"  process wall time {wall * 1000:.1f} ms (interpreter start and exit included)")
+    total = sum(seconds for seconds, _ in packages.values())
+    modules = sum(count for _, count in packages.values())
+    lines += ["", f"Imports: {total * 1000:.1f} ms in {modules} modules; slowest packages (self time):"]
+    ranked = sorted(packages.items(), key=lambda item: item[1][0], reverse=True)
+    for package, (seconds, count) in ranked[:top]:
+        lines.append(f"  {package:<24} {seconds * 1000:>8.1f} ms  {count:>4} modules")
+    return "\n".join(lines)
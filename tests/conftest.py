@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import contract_generator  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def no_archive(monkeypatch):
+    """Keep builds out of the working directory's archive; archive tests set their own path."""
+    monkeypatch.setattr(contract_generator, "ARCHIVE_PATH", "")
+
+@pytest.fixture
+def data():
+    return contract_generator.normalize_data({
+        "client_name": "Acme Transit Authority",
+        "project_name": "Blue Line Extension",
+        "nte": 250000,
+    })
@@ -0,0 +1,56 @@
+import pytest
+from docx import Document
+
+import amendments
+import contract_generator
+
+def texts(source):
+    return [amendments.element_text(e) for e in amendments.body_elements(Document(source).element.body)]
+
+def rendered_texts(data):
+    body = contract_generator.render_document(data).element.body
+    return [amendments.element_text(e) for e in amendments.body_elements(body)]
+
+@pytest.fixture
+def agreement(tmp_path, data):
+    path = tmp_path / "Agreement.docx"
+    contract_generator.build_agreement(data, output_path=str(path))
+    new_data = dict(data, nte=400000)
+    old, new = rendered_texts(data), rendered_texts(new_data)
+    changing = [text for text in old if text not in new]
+    unchanged = [text for text in old if text in new and len(text) > 40 and old.count(text) == 1]
+    assert changing and unchanged
+    return path, new_data, changing, unchanged
+
+def hand_edit(path, original, replacement):
+    doc = Document(str(path))
+    paragraph = next(p for p in doc.paragraphs if p.text == original)
+    for run in paragraph.runs[1:]:
+        run.text = ""
+    paragraph.runs[0].text = replacement
+    doc.save(str(path))
+
+def test_amendment_keeps_unrelated_hand_edits(agreement, data):
+    path, new_data, _, unchanged = agreement
+    edited = unchanged[0] + " (as agreed by phone)"
+    hand_edit(path, unchanged[0], edited)
+
+    result = amendments.amend(str(path), data, new_data)
+
+    expected = [edited if text == unchanged[0] else text for text in rendered_texts(new_data)]
+    assert texts(str(path)) == expected
+    assert set(result.changed) == {"nte"}
+    assert result.overwritten == []
+
+def test_amendment_refuses_to_overwrite_hand_edits(agreement, data):
+    path, new_data, changing, _ = agreement
+    hand_edit(path, changing[0], changing[0] + " (edited)")
+
+    with pytest.raises(amendments.AmendmentConflict) as conflict:
+        amendments.amend(str(path), data, new_data)
+    assert [expected for _, _, expected in conflict.value.conflicts] == [changing[0]]
+
+    result = amendments.amend(str(path), data, new_data, force=True)
+    assert texts(str(path)) == rendered_texts(new_data)
+    assert len(result.overwritten) == 1
+    assert "Hand edits overwritten" in result.redline
@@ -0,0 +1,60 @@
+import csv
+import datetime
+
+import pytest
+
+import archive
+import contract_generator
+
+@pytest.fixture
+def archive_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "agreements.sqlite3")
+    monkeypatch.setattr(contract_generator, "ARCHIVE_PATH", path)
+    return path
+
+def test_build_records_normalized_data(tmp_path, archive_path, data):
+    data["effective_date"] = datetime.date(2026, 1, 2)
+    contract_generator.build_agreement(data, output_path=str(tmp_path / "Agreement.docx"))
+
+    rows = archive.search(client="acme", min_amount=100000, path=archive_path)
+    assert len(rows) == 1
+    assert rows[0]["location"] == str(tmp_path / "Agreement.docx")
+    assert rows[0]["data"]["nte"] == 250000
+    assert rows[0]["data"]["effective_date"] == "2026-01-02"
+    assert archive.search(text='"Blue Line Extension"', path=archive_path)
+
+def test_record_never_raises(tmp_path, archive_path, data, caplog):
+    archive.record({"nte": "lots"}, str(tmp_path / "Agreement.docx"))
+    archive.record(data, str(tmp_path / "missing.docx"))
+    assert archive.search(path=archive_path) == []
+    assert len([r for r in caplog.records if "not archived" in r.getMessage()]) == 2
+
+def test_batch_records_successful_rows(tmp_path, archive_path):
+    rows = tmp_path / "rows.csv"
+    with open(rows, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["client_name", "nte"])
+        writer.writerows([["Acme", 1000], ["Bad Row", "n/a"], ["Globex", 2000]])
+
+    failures = contract_generator.run_batch(str(rows), str(tmp_path / "out"), workers=1)
+
+    assert [row for row, _ in failures] == [2]
+    found = sorted(row["client_name"] for row in archive.search(path=archive_path))
+    assert found == ["Acme", "Globex"]
+
+def test_backfill_recovers_data(tmp_path, data, monkeypatch):
+    old = tmp_path / "old"
+    old.mkdir()
+    contract_generator.build_agreement(data, output_path=str(old / "Agreement.docx"))  # archive off
+    (old / "notes.docx").write_bytes(b"not a zip")
+    path = str(tmp_path / "backfill.sqlite3")
+    monkeypatch.setattr(contract_generator, "ARCHIVE_PATH", path)
+
+    indexed, skipped, failed = archive.backfill([str(old)])
+    assert (indexed, skipped) == (1, 0)
+    assert [name for name, _ in failed] == [str(old / "notes.docx")]
+    row, = archive.search(client="Acme", path=path)
+    assert row["source"] == "backfill"
+    assert {key: row["data"][key] for key in data} == data
+
+    assert archive.backfill([str(old)])[:2] == (0, 1)  # unchanged files are skipped
@@ -0,0 +1,33 @@
+import io
+import zipfile
+
+import pytest
+from docx import Document
+
+import contract_generator
+
+@pytest.mark.parametrize("backend", contract_generator.BACKENDS)
+def test_package_round_trips(data, backend):
+    blob = contract_generator.build_agreement_bytes(data, backend=backend)
+    with zipfile.ZipFile(io.BytesIO(blob)) as package:
+        assert package.testzip() is None  # every member's CRC checks out
+        names = package.namelist()
+        assert names[0] == "[Content_Types].xml"
+        assert "word/document.xml" in names
+        assert len(names) == len(set(names))
+    text = "\n".join(p.text for p in Document(io.BytesIO(blob)).paragraphs)
+    assert "Acme Transit Authority" in text
+    assert "Blue Line Extension" in text
+
+@pytest.mark.parametrize("level", [0, 9])
+def test_zip_levels_round_trip(data, level):
+    for backend in contract_generator.BACKENDS:
+        buf = io.BytesIO()
+        contract_generator.build_agreement(data, output_path=buf, backend=backend, level=level)
+        with zipfile.ZipFile(buf) as package:
+            assert package.testzip() is None
+
+def test_backends_render_the_same_text(data):
+    texts = [[p.text for p in Document(io.BytesIO(contract_generator.build_agreement_bytes(data, backend=b))).paragraphs]
+             for b in contract_generator.BACKENDS]
+    assert texts[0] == texts[1]
@@ -0,0 +1,154 @@
+"""
+Powell CM Solutions - WordprocessingML Backend
+----------------------------------------------
+Writes agreements without going through python-docx's object model.
+
+For each option combination the python-docx skeleton (see contract_generator)
+is serialized once and compiled into a flat plan: literal XML fragments with
+{{field}} slots, plus the XML of one rate card row. Rendering a document is a
+string join of pre-escaped fragments. The package parts that never change
+(styles, settings, theme, content types, ...) come from the docx_package
+template, are deflated once per compression level and copied into every
+output zip as-is; only word/document.xml is compressed per call.
+
+Usage:
+    contract_generator.build_agreement(data, output_path, backend="xml")
+"""
+
+import io
+import struct
+import zipfile
+import zlib
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from docx.opc.oxml import serialize_part_xml
+
+import clauses
+import contract_generator
+import docx_package
+import metrics
+import rate_schedule
+
+DOCUMENT_PART = "word/document.xml"
+ROW_MARKER = "{{rate_row}}"
+
+DOS_DATE = (1 << 5) | 1  # 1980-01-01, keeps output bytes deterministic
+DOS_TIME = 0
+
+def compile_fragments(xml):
+    """Split XML into [literal, field, literal, field, ..., literal] on {{field}} slots."""
+    return tuple(contract_generator.PLACEHOLDER_RE.split(xml))
+
+def render_fragments(fragments, fields, out):
+    out.append(fragments[0])
+    for i in range(1, len(fragments), 2):
+        out.append(fields[fragments[i]])
+        out.append(fragments[i + 1])
+
+# ---------------------------- Plans ----------------------------
+
+# Same bound as the python-docx skeleton cache. A plan is only ~16 KB of strings,
+# but matching sizes keeps the two backends' hit rates comparable.
+PLAN_CACHE_SIZE = contract_generator.SKELETON_CACHE_SIZE
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def get_plan(key):
+    """Compile a plan for an option_key() tuple.
+
+    Returns (head, middle, tail, widths): rate card rows go between head and
+    middle, the projected-rates table (if the key enables it) between middle
+    and tail; tail is None otherwise. widths are the rate card column widths.
+    """
+    # A throwaway skeleton: keeping it would evict entries from the docx backend's cache.
+    doc = contract_generator.build_skeleton(key)
+    table = doc.tables[0]
+    widths = rate_schedule.table_widths(table)
+    cells = table.add_row().cells
+    cells[0].text = ROW_MARKER
+    xml = serialize_part_xml(doc.element).decode('utf-8')
+
+    marker = xml.index(ROW_MARKER)
+    row_start = xml.rindex("<w:tr", 0, marker)
+    row_end = xml.index("</w:tr>", marker) + len("</w:tr>")
+    head, rest = xml[:row_start], xml[row_end:]
+    if contract_generator.PROJECTION_MARKER not in rest:
+        return compile_fragments(head), compile_fragments(rest), None, widths
+
+    marker = rest.index(contract_generator.PROJECTION_MARKER)
+    p_start = max(rest.rfind("<w:p>", 0, marker), rest.rfind("<w:p ", 0, marker))
+    p_end = rest.index("</w:p>", marker) + len("</w:p>")
+    return compile_fragments(head), compile_fragments(rest[:p_start]), compile_fragments(rest[p_end:]), widths
+
+clauses.on_reload(get_plan.cache_clear)
+
+def render_document_xml(data):
+    with metrics.span("plan"):
+        head, middle, tail, widths = get_plan(contract_generator.option_key(data))
+    fields = {k: escape(v) for k, v in contract_generator.render_fields(data).items()}
+    clean = contract_generator.clean_text
+    out = []
+    render_fragments(head, fields, out)
+    with metrics.span("rate_table"):
+        out.append(rate_schedule.rows_xml(rate_schedule.rate_rows(data['rates'], clean), widths))
+    render_fragments(middle, fields, out)
+    if tail is not None:
+        with metrics.span("rate_projection"):
+            out.append(contract_generator.projection_xml(data))
+        render_fragments(tail, fields, out)
+    return "".join(out).encode('utf-8')
+
+# ---------------------------- Package ----------------------------
+
+class ZipEntry:
+    """A package part stored as a raw deflate stream with its precomputed CRC and sizes."""
+
+    def __init__(self, name, blob, level=zlib.Z_DEFAULT_COMPRESSION):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        self.name = name.encode('utf-8')
+        self.data = compressor.compress(blob) + compressor.flush()
+        self.crc = zlib.crc32(blob)
+        self.size = len(blob)
+
+    def local_header(self):
+        return struct.pack('<4s5H3L2H', b'PK\x03\x04', 20, 0, zipfile.ZIP_DEFLATED, DOS_TIME, DOS_DATE,
+                           self.crc, len(self.data), self.size, len(self.name), 0) + self.name
+
+    def central_header(self, offset):
+        return struct.pack('<4s6H3L5H2L', b'PK\x01\x02', 20, 20, 0, zipfile.ZIP_DEFLATED, DOS_TIME, DOS_DATE,
+                           self.crc, len(self.data), self.size, len(self.name), 0, 0, 0, 0, 0, offset) + self.name
+
+@lru_cache(maxsize=None)
+def static_parts(level):
+    """Entries of the package template deflated at `level`, with None where word/document.xml goes."""
+    entries = []
+    with zipfile.ZipFile(io.BytesIO(docx_package.template())) as zf:
+        for name in zf.namelist():
+            entries.append(None if name == DOCUMENT_PART else ZipEntry(name, zf.read(name), level))
+    return tuple(entries)
+
+def write_package(document_xml, stream, level=None):
+    level = docx_package.ZIP_LEVEL if level is None else level
+    entries = [e if e is not None else ZipEntry(DOCUMENT_PART, document_xml, level) for e in static_parts(level)]
+    offset = 0
+    central = []
+    for entry in entries:
+        header = entry.local_header()
+        central.append(entry.central_header(offset))
+        stream.write(header)
+        stream.write(entry.data)
+        offset += len(header) + len(entry.data)
+    directory = b"".join(central)
+    stream.write(directory)
+    stream.write(struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, len(entries), len(entries),
+                             len(directory), offset, 0))
+
+def save(data, output_path, level=None):
+    with metrics.span("document_xml"):
+        document_xml = render_document_xml(data)
+    with metrics.span("package"):
+        if hasattr(output_path, 'write'):
+            write_package(document_xml, output_path, level)
+        else:
+            with open(output_path, 'wb') as fh:
+                write_package(document_xml, fh, level)